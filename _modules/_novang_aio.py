@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Coroutines behind novang_async.run
+
+Kept out of novang_async so the Python 2 loader never compiles them. The
+leading underscore makes the Salt loader skip this file, novang_async
+imports it on first use.
+'''
+import asyncio
+import json
+import ssl
+import time
+
+import aiohttp
+
+from salt.exceptions import CommandExecutionError
+
+
+async def _request(session, request, records):
+    '''
+    Issue one request, walking limit/marker pages of listings
+
+    Every HTTP request is appended to records as method, url, elapsed
+    seconds, status (None when no response came) and response bytes.
+    '''
+    items = []
+    params = {'limit': request['limit']} if request['limit'] else {}
+    while True:
+        start = time.time()
+        status, size = None, 0
+        try:
+            async with session.request(request['method'], request['url'],
+                                       params=params, json=request['json']) as response:
+                status = response.status
+                text = await response.text()
+                size = response.content_length or len(text)
+        finally:
+            records.append([request['method'], request['url'],
+                            time.time() - start, status, size])
+        if status >= 400:
+            raise CommandExecutionError('{0} {1} failed with {2}: {3}'.format(
+                request['method'], request['url'], status, text))
+        body = json.loads(text) if text else None
+        result = body.get(request['key']) if request['key'] else body
+        if not request['limit']:
+            return result
+        items.extend(result)
+        if len(result) < request['limit']:
+            return items
+        params['marker'] = result[-1]['id']
+
+
+async def _run(requests, token, concurrency, timeout, verify, records):
+    if verify is False:
+        ssl_context = False
+    elif isinstance(verify, str):
+        ssl_context = ssl.create_default_context(cafile=verify)
+    else:
+        ssl_context = None
+    connector = aiohttp.TCPConnector(limit=concurrency, ssl=ssl_context)
+    headers = {'X-Auth-Token': token, 'Accept': 'application/json'}
+    async with aiohttp.ClientSession(
+            connector=connector, headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        return await asyncio.gather(
+            *[_request(session, request, request_records)
+              for request, request_records in zip(requests, records)],
+            return_exceptions=True)
+
+
+def run(requests, token, concurrency, timeout, verify):
+    '''
+    Run requests on one pooled session
+
+    Returns list of (result or exception, HTTP request records) in the
+    order of requests.
+    '''
+    records = [[] for _ in requests]
+    results = asyncio.run(_run(requests, token, concurrency, timeout,
+                               verify, records))
+    return list(zip(results, records))
@@ -4,6 +4,7 @@ from pprint import pprint
 
 # Import python libs
 import logging
+from multiprocessing.pool import ThreadPool
 
 # Get logging started
 log = logging.getLogger(__name__)
@@ -31,10 +32,15 @@ def __virtual__():
 __opts__ = {}
 
 
-def _authng(profile=None, tenant_name=None):
+def _authng(profile=None, tenant_name=None, region_name=None, **connection_args):
     '''
     Set up nova credentials
+
+    connection_user, connection_password, connection_tenant,
+    connection_auth_url and connection_region_name override the profile,
+    for minions without a keystone profile.
     '''
+    region_override = region_name
     if profile:
         credentials = __salt__['config.option'](profile)
         user = credentials['keystone.user']
@@ -49,6 +55,8 @@ def _authng(profile=None, tenant_name=None):
         os_auth_system = credentials.get('keystone.os_auth_system', None)
         use_keystoneauth = credentials.get('keystone.use_keystoneauth', False)
         verify = credentials.get('keystone.verify', True)
+        token_cache = credentials.get('keystone.token_cache', False)
+        token_cache_refresh = credentials.get('keystone.token_cache_refresh', 300)
     else:
         user = __salt__['config.option']('keystone.user')
         password = __salt__['config.option']('keystone.password')
@@ -59,6 +67,8 @@ def _authng(profile=None, tenant_name=None):
         os_auth_system = __salt__['config.option']('keystone.os_auth_system')
         use_keystoneauth = __salt__['config.option']('keystone.use_keystoneauth', False)
         verify = __salt__['config.option']('keystone.verify', True)
+        token_cache = __salt__['config.option']('keystone.token_cache', False)
+        token_cache_refresh = __salt__['config.option']('keystone.token_cache_refresh', 300)
 
     kwargs = {
         'username': user,
@@ -70,32 +80,230 @@ def _authng(profile=None, tenant_name=None):
         'os_auth_plugin': os_auth_system,
         'use_keystoneauth': use_keystoneauth,
         'verify': verify,
+        'token_cache': token_cache,
+        'token_cache_refresh': token_cache_refresh,
         'profile': profile
     }
-    return SaltNova(**kwargs)
+    if region_override:
+        kwargs['region_name'] = region_override
+    for arg, key in (('connection_user', 'username'),
+                     ('connection_password', 'password'),
+                     ('connection_tenant', 'project_id'),
+                     ('connection_auth_url', 'auth_url'),
+                     ('connection_region_name', 'region_name')):
+        if connection_args.get(arg):
+            kwargs[key] = kwargs[arg] = connection_args[arg]
+    return _connect(**kwargs)
+
+
+def _connection_args(kwargs):
+    '''
+    Pick connection_* arguments out of function keyword arguments
+    '''
+    return dict([(key, value) for key, value in six.iteritems(kwargs)
+                 if key.startswith('connection_')])
+
+
+def _connect(**kwargs):
+    '''
+    Return SaltNova connection shared by all calls within one job
+
+    Connections are stored in __context__ keyed by profile, tenant, region
+    and API version, so the keystone session and its HTTP connection pool
+    are reused instead of authenticating on every call.
+    '''
+    key = (kwargs.get('profile'),
+           kwargs.get('auth_url'),
+           kwargs.get('username'),
+           kwargs.get('project_id'),
+           kwargs.get('region_name'),
+           str(kwargs.get('version', 2)))
+    connections = __context__.setdefault('novang.connections', {})
+    if key not in connections:
+        log.debug('Creating new nova connection for {0}'.format(key))
+        connections[key] = SaltNova(**kwargs)
+    return connections[key]
+
+
+def _fan_out(func, items, concurrency=10):
+    '''
+    Call func for every item in a bounded thread pool
+
+    Returns list of (item, result, error) tuples in the order of items,
+    exceptions are returned as error instead of being raised.
+    '''
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug('Call for {0} failed: {1}'.format(item, exc))
+            return item, None, exc
+
+    pool = ThreadPool(max(1, min(int(concurrency), len(items))))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def scoped_list(kind='server', tenants=None, regions=None, profile=None,
+                concurrency=10):
+    '''
+    List resources of many tenants and regions at once
+
+    Every tenant/region scope gets its own session and the listings run in a
+    bounded thread pool. Returns dict with the merged items keyed by
+    tenant/region/name, each with tenant and region attached, and errors
+    keyed by tenant/region.
+    kind
+        server, secgroup, flavor, image, keypair, floating_ip or volume
+    tenants
+        List or comma separated tenant names, default is the profile tenant
+    regions
+        List or comma separated region names, default is the profile region
+    concurrency
+        Maximum number of scopes listed in parallel
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.scoped_list server tenants=admin,demo regions=RegionOne,RegionTwo
+    '''
+    if kind not in ('server', 'secgroup', 'flavor', 'image', 'keypair',
+                    'floating_ip', 'volume'):
+        raise SaltCloudSystemExit('Unsupported kind {0}'.format(kind))
+    if isinstance(tenants, six.string_types):
+        tenants = tenants.split(',')
+    if isinstance(regions, six.string_types):
+        regions = regions.split(',')
+    tenants = tenants or [_profile_option(profile, 'tenant')]
+    regions = regions or [_profile_option(profile, 'region_name')]
+    scopes = [(tenant, region) for tenant in tenants for region in regions]
+
+    def listing(scope):
+        return getattr(_authng(profile, scope[0], scope[1]), kind + '_list')()
+
+    ret = {'items': {}, 'errors': {}}
+    for (tenant, region), items, error in _fan_out(listing, scopes, concurrency):
+        scope = '{0}/{1}'.format(tenant, region)
+        if error is not None:
+            ret['errors'][scope] = str(error)
+            continue
+        for name, item in six.iteritems(items):
+            item = dict(item, tenant=tenant, region=region)
+            ret['items']['{0}/{1}'.format(scope, name)] = item
+    return ret
+
 
+def _profile_option(profile, key, default=None):
+    '''
+    Return keystone.<key> option of the profile
+    '''
+    if profile:
+        return __salt__['config.option'](profile).get('keystone.' + key, default)
+    return __salt__['config.option']('keystone.' + key, default)
+
+
+def _catalog_file(profile, tenant_name, kind):
+    '''
+    Return path of a persisted catalog, grouped per profile and kind so all
+    tenants of a kind can be dropped at once
+    '''
+    return _cache_path('catalog', _cache_key(profile, kind),
+                       _cache_key(tenant_name) + '.json')
+
+
+def _catalog_entry(kind, profile=None, tenant_name=None):
+    '''
+    Return cached catalog entry if it is still fresh, otherwise None
+
+    Catalogs are kept in __context__ for keystone.catalog_cache_ttl seconds
+    (default 300, 0 disables caching) and with keystone.catalog_cache_persist
+    they are also stored in the minion cachedir for following jobs.
+    '''
+    ttl = int(_profile_option(profile, 'catalog_cache_ttl', 300))
+    if not ttl:
+        return None
+    key = (profile, tenant_name, kind)
+    catalogs = __context__.setdefault('novang.catalogs', {})
+    entry = catalogs.get(key)
+    if entry is None and _profile_option(profile, 'catalog_cache_persist', False):
+        entry = _cache_read(_catalog_file(*key))
+        if entry:
+            catalogs[key] = entry
+    if entry and time.time() - entry['timestamp'] <= ttl:
+        return entry
+    return None
+
+
+def _catalog(kind, profile=None, tenant_name=None, refresh=False):
+    '''
+    Return flavor, image, keypair or secgroup catalog of the profile
+
+    Besides the name keyed catalog the cache entry holds an id to name index.
+    '''
+    entry = None if refresh else _catalog_entry(kind, profile, tenant_name)
+    if entry is None:
+        conn = _authng(profile, tenant_name)
+        data = getattr(conn, kind + '_list')()
+        index = {}
+        for name, item in six.iteritems(data):
+            if item.get('id') is not None:
+                index[str(item['id'])] = name
+        entry = {'timestamp': time.time(), 'data': data, 'index': index}
+        key = (profile, tenant_name, kind)
+        __context__.setdefault('novang.catalogs', {})[key] = entry
+        if _profile_option(profile, 'catalog_cache_persist', False):
+            try:
+                _cache_write(_catalog_file(*key), entry)
+            except (IOError, OSError) as exc:
+                log.warning('Unable to store {0} catalog: {1}'.format(kind, exc))
+    return entry['data']
+
+
+def _catalog_invalidate(kind, profile=None):
+    '''
+    Drop cached catalogs of the given kind after a create or delete
 
-def server_list(profile=None, tenant_name=None):
+    Persisted catalogs of all tenants are removed too, also when this job
+    has not loaded them.
+    '''
+    catalogs = __context__.setdefault('novang.catalogs', {})
+    for key in list(catalogs):
+        if key[0] == profile and key[2] == kind:
+            del catalogs[key]
+    for path in glob.glob(_cache_path('catalog', _cache_key(profile, kind), '*.json')):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def server_list(profile=None, tenant_name=None, page_size=None):
     '''
     Return list of active servers
+    page_size
+        Walk the servers API in pages of this many servers, this bounds the
+        size of each API response, the returned dictionary still holds all
+        servers
     CLI Example:
     .. code-block:: bash
         salt '*' nova.server_list
+        salt '*' nova.server_list page_size=500
     '''
     conn = _authng(profile, tenant_name)
-    return conn.server_list()
+    return conn.server_list(page_size=page_size)
 
 
 def server_get(name, tenant_name=None, profile=None):
     '''
     Return information about a server
     '''
-    items = server_list(profile, tenant_name)
-    instance_id = None
-    for key, value in items.iteritems():
-        if key == name:
-            instance_id = value['id']
-    return instance_id
+    conn = _authng(profile, tenant_name)
+    return conn._server_uuid_from_name(name) or None
 
 
 def get_connection_args(profile=None):
@@ -118,13 +326,23 @@ def get_connection_args(profile=None):
     return kwargs
 
 
+def _tenant_id(tenant_name, profile=None):
+    '''
+    Return keystone id of the tenant, looked up once per job
+    '''
+    tenants = __context__.setdefault('novang.tenants', {})
+    if (profile, tenant_name) not in tenants:
+        connection_args = get_connection_args(profile)
+        tenant = __salt__['keystone.tenant_get'](name=tenant_name, profile=profile, **connection_args)
+        tenants[(profile, tenant_name)] = tenant[tenant_name]['id']
+    return tenants[(profile, tenant_name)]
+
+
 def quota_list(tenant_name, profile=None):
     '''
     list quotas of a tenant
     '''
-    connection_args = get_connection_args(profile)
-    tenant = __salt__['keystone.tenant_get'](name=tenant_name, profile=profile, **connection_args)
-    tenant_id = tenant[tenant_name]['id']
+    tenant_id = _tenant_id(tenant_name, profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     item = nt_ks.quotas.get(tenant_id).__dict__
@@ -144,24 +362,89 @@ def quota_update(tenant_name, profile=None, **quota_argument):
     '''
     update quota of specified tenant
     '''
-    connection_args = get_connection_args(profile)
-    tenant = __salt__['keystone.tenant_get'](name=tenant_name, profile=profile, **connection_args)
-    tenant_id = tenant[tenant_name]['id']
+    tenant_id = _tenant_id(tenant_name, profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     item = nt_ks.quotas.update(tenant_id, **quota_argument)
     return item
 
 
-def server_list(profile=None, tenant_name=None):
+def quotas_apply(quotas, profile, concurrency=10, test=False):
+    '''
+    Reconcile quotas of many tenants
+
+    Project ids are resolved with one keystone tenant listing, then the
+    current quota sets are read at once with novang.batch and only
+    differing keys are updated, one tenant per worker of a bounded thread
+    pool.
+    quotas
+        Dictionary of tenant name to dictionary of quota values
+    profile
+        Keystone profile with the credentials
+    concurrency
+        Maximum number of tenants processed in parallel
+    test
+        Only report the changes
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.quotas_apply \
+                quotas='{"demo": {"cores": 20}, "admin": {"ram": 102400}}' \
+                profile=openstack
+    '''
+    ret = {'changes': {}, 'errors': {}}
+    connection_args = get_connection_args(profile)
+    tenants = __salt__['keystone.tenant_list'](profile=profile, **connection_args)
+    tenant_ids = __context__.setdefault('novang.tenants', {})
+    for tenant_name in quotas:
+        if tenant_name in tenants:
+            tenant_ids[(profile, tenant_name)] = tenants[tenant_name]['id']
+        else:
+            ret['errors'][tenant_name] = 'Tenant {0} not found'.format(tenant_name)
+    conn = _authng(profile)
+    nt_ks = conn.compute_conn
+    names = sorted([name for name in quotas if name not in ret['errors']])
+    reads = _batch_run(conn, [{'op': 'quota_show',
+                               'tenant_id': tenant_ids[(profile, name)]}
+                              for name in names], concurrency)
+    pending = {}
+    for tenant_name, read in zip(names, reads):
+        if 'error' in read:
+            ret['errors'][tenant_name] = read['error']
+            continue
+        changes = dict([(key, value) for key, value in six.iteritems(quotas[tenant_name])
+                        if read['result'].get(key) != value])
+        if changes:
+            pending[tenant_name] = changes
+    if test:
+        ret['changes'] = pending
+        return ret
+
+    def update(tenant_name):
+        nt_ks.quotas.update(tenant_ids[(profile, tenant_name)],
+                            **pending[tenant_name])
+
+    for tenant_name, _, error in _fan_out(update, sorted(pending), concurrency):
+        if error is not None:
+            ret['errors'][tenant_name] = str(error)
+        else:
+            ret['changes'][tenant_name] = pending[tenant_name]
+    return ret
+
+
+def server_list(profile=None, tenant_name=None, page_size=None):
     '''
     Return list of active servers
+    page_size
+        Walk the servers API in pages of this many servers, this bounds the
+        size of each API response, the returned dictionary still holds all
+        servers
     CLI Example:
     .. code-block:: bash
         salt '*' nova.server_list
+        salt '*' nova.server_list page_size=500
     '''
     conn = _authng(profile, tenant_name)
-    return conn.server_list()
+    return conn.server_list(page_size=page_size)
 
 
 def secgroup_list(profile=None, tenant_name=None):
@@ -171,11 +454,11 @@ def secgroup_list(profile=None, tenant_name=None):
     .. code-block:: bash
         salt '*' nova.secgroup_list
     '''
-    conn = _authng(profile, tenant_name)
-    return conn.secgroup_list()
+    return _catalog('secgroup', profile, tenant_name)
 
 
-def boot(name, flavor_id=0, image_id=0, profile=None, tenant_name=None, timeout=300, **kwargs):
+def boot(name, flavor_id=0, image_id=0, profile=None, tenant_name=None, timeout=300,
+         target_states=None, **kwargs):
     '''
     Boot (create) a new instance
     name
@@ -188,6 +471,9 @@ def boot(name, flavor_id=0, image_id=0, profile=None, tenant_name=None, timeout=
         How long to wait, after creating the instance, for the provider to
         return information about it (default 300 seconds).
         .. versionadded:: 2014.1.0
+    target_states
+        List or comma separated states to wait for (default ACTIVE), the
+        boot fails as soon as the instance goes to ERROR otherwise
     CLI Example:
     .. code-block:: bash
         salt '*' nova.boot myinstance flavor_id=4596 image_id=2
@@ -199,7 +485,238 @@ def boot(name, flavor_id=0, image_id=0, profile=None, tenant_name=None, timeout=
     '''
     #kwargs = {'nics': nics}
     conn = _authng(profile, tenant_name)
-    return conn.boot(name, flavor_id, image_id, timeout, **kwargs)
+    return conn.boot(name, flavor_id, image_id, timeout, target_states, **kwargs)
+
+
+def boot_many(instances, profile=None, tenant_name=None, concurrency=10,
+              timeout=300, target_states=None):
+    '''
+    Boot many instances at once
+
+    Create requests are submitted in parallel and all new instances are
+    waited for together, so the call takes about as long as the slowest
+    boot. Returns dict with details of the booted instances and errors, both
+    keyed by instance name.
+    instances
+        List of instance specs, each a dictionary with name, flavor_id,
+        image_id and other boot arguments (nics, security_groups, key_name,
+        ...). With count set, that many identical instances named
+        <name>-<n> are requested with a single call.
+    concurrency
+        Maximum number of create requests in flight
+    timeout
+        How long to wait for all instances (default 300 seconds)
+    target_states
+        List or comma separated states to wait for (default ACTIVE)
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.boot_many \
+                instances='[{"name": "web", "count": 10, "flavor_id": 2, "image_id": "<uuid>"}]'
+    '''
+    ret = {'servers': {}, 'errors': {}}
+    specs = {}
+    for spec in instances:
+        if spec['name'] in specs:
+            ret['errors'][spec['name']] = 'Duplicate instance spec'
+        specs[spec['name']] = dict(spec)
+    conn = _authng(profile, tenant_name)
+
+    def create(name):
+        spec = dict(specs[name])
+        spec.pop('name')
+        return conn.boot_create(name, **spec)
+
+    names = sorted([name for name in specs if name not in ret['errors']])
+    created = {}
+    for name, servers, error in _fan_out(create, names, concurrency):
+        if error is not None:
+            ret['errors'][name] = str(error)
+            continue
+        for server_id, server_name, password in servers:
+            created[server_id] = (server_name, password)
+
+    # the first tick lists without changes-since, later ticks filter on the
+    # newest update time reported by the API, never on the minion clock
+    result = conn.servers_wait(list(created), target_states, timeout)
+    for server_id, item in six.iteritems(result['done']):
+        server = conn._server_detailed(item)
+        if created[server_id][1]:
+            server['password'] = created[server_id][1]
+        ret['servers'][item.name] = server
+    for server_id, message in six.iteritems(result['failed']):
+        ret['errors'][created[server_id][0]] = 'Server {0} went to {1}'.format(
+            server_id, message)
+    for server_id in result['pending']:
+        ret['errors'][created[server_id][0]] = \
+            'Timed out waiting for server {0}'.format(server_id)
+    return ret
+
+
+def _batch_request(endpoint, call, page_size=None):
+    '''
+    Translate one batch call into a compute API request
+
+    Returns dict with method, url, json body, response key and the page
+    size for paginated listings.
+    '''
+    call = dict(call)
+    operation = call.pop('op')
+    request = {'method': 'GET', 'json': None, 'limit': None}
+    if operation == 'server_list_detailed':
+        request.update(path='/servers/detail', key='servers',
+                       limit=page_size or SERVER_PAGE_SIZE)
+    elif operation == 'flavor_list':
+        request.update(path='/flavors/detail', key='flavors')
+    elif operation == 'image_list':
+        request.update(path='/images/detail', key='images')
+    elif operation == 'floating_ip_list':
+        request.update(path='/os-floating-ips', key='floating_ips')
+    elif operation == 'volume_list':
+        request.update(path='/os-volumes/detail', key='volumes')
+    elif operation == 'quota_show':
+        request.update(path='/os-quota-sets/{0}'.format(call['tenant_id']),
+                       key='quota_set')
+    elif operation == 'boot':
+        server = dict(call)
+        server['flavorRef'] = str(server.pop('flavor_id'))
+        server['imageRef'] = str(server.pop('image_id', None) or '')
+        if 'nics' in server:
+            keys = {'net-id': 'uuid', 'v4-fixed-ip': 'fixed_ip', 'port-id': 'port'}
+            server['networks'] = [
+                dict([(keys.get(key, key), value) for key, value in six.iteritems(nic)])
+                for nic in server.pop('nics')]
+        if 'security_groups' in server:
+            server['security_groups'] = [{'name': secgroup}
+                                         for secgroup in server['security_groups']]
+        request.update(method='POST', path='/servers', key='server',
+                       json={'server': server})
+    elif operation == 'server_delete':
+        request.update(method='DELETE', key=None,
+                       path='/servers/{0}'.format(call['server_id']))
+    else:
+        raise SaltCloudSystemExit('Unsupported batch operation {0}'.format(operation))
+    request['url'] = endpoint.rstrip('/') + request.pop('path')
+    return request
+
+
+def _batch_sync(session, requests, concurrency=10):
+    '''
+    Run batch requests on the keystone session in a bounded thread pool
+    '''
+    def call(request):
+        items = []
+        params = {'limit': request['limit']} if request['limit'] else {}
+        while True:
+            url = request['url']
+            if params:
+                url += '?' + urlencode(params)
+            response = session.request(url, request['method'],
+                                       json=request['json'])
+            body = response.json() if response.text else None
+            result = body.get(request['key']) if request['key'] else body
+            if not request['limit']:
+                return result
+            items.extend(result)
+            if len(result) < request['limit']:
+                return items
+            params['marker'] = result[-1]['id']
+
+    ret = []
+    for _, result, error in _fan_out(call, requests, concurrency):
+        if error is not None:
+            ret.append({'error': str(error)})
+        else:
+            ret.append({'result': result})
+    return ret
+
+
+def _batch_run(conn, calls, concurrency=10, timeout=300):
+    '''
+    Run batch calls on a SaltNova connection
+
+    Calls that cannot be translated fail on their own, results are shaped
+    by SaltNova.batch_shape and requests made by novang_async are added to
+    the job statistics.
+    '''
+    endpoint = conn.compute_conn.client.get_endpoint()
+    ret = [None] * len(calls)
+    positions = []
+    requests = []
+    for position, call in enumerate(calls):
+        try:
+            requests.append(_batch_request(endpoint, call))
+        except KeyError as exc:
+            ret[position] = {'error': 'Missing argument {0}'.format(exc)}
+            continue
+        except SaltCloudSystemExit as exc:
+            ret[position] = {'error': str(exc)}
+            continue
+        positions.append(position)
+    if 'novang_async.run' in __salt__:
+        results = __salt__['novang_async.run'](requests, conn.session.get_token(),
+                                               concurrency, timeout,
+                                               verify=conn.session.verify)
+        for result in results:
+            for method, url, elapsed, status, size in result.pop('requests', []):
+                _stats_record(method, url, elapsed, status, size)
+    else:
+        results = _batch_sync(conn.session, requests, concurrency)
+    for position, result in zip(positions, results):
+        if 'result' in result:
+            try:
+                result = {'result': conn.batch_shape(calls[position]['op'],
+                                                     result['result'])}
+            except (AttributeError, KeyError, TypeError) as exc:
+                result = {'error': 'Unexpected response: {0}'.format(exc)}
+        ret[position] = result
+    return ret
+
+
+def batch(calls, profile=None, tenant_name=None, concurrency=10, timeout=300):
+    '''
+    Run many compute API calls at once
+
+    When the novang_async module is available (Python 3.7 with aiohttp) the
+    calls are issued concurrently on a pooled HTTP session, otherwise on the
+    keystone session in a thread pool. Returns list of dictionaries with
+    result or error in the order of calls, results are formatted like the
+    matching novang functions return them (quota_show returns the quota
+    set, boot the id and password of the new server).
+    calls
+        List of dictionaries with op and its arguments. Supported ops are
+        server_list_detailed, flavor_list, image_list, floating_ip_list,
+        volume_list, quota_show (tenant_id), boot (name, flavor_id,
+        image_id, nics, security_groups, ...) and server_delete (server_id)
+    concurrency
+        Maximum number of requests in flight
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.batch \
+                calls='[{"op": "flavor_list"}, {"op": "quota_show", "tenant_id": "<id>"}]'
+    '''
+    return _batch_run(_authng(profile, tenant_name), calls, concurrency, timeout)
+
+
+def servers_wait(server_ids, target_states=None, timeout=300, profile=None,
+                 tenant_name=None):
+    '''
+    Wait for many instances to reach target states with one list call per
+    poll instead of one call per instance
+    server_ids
+        List or comma separated instance IDs
+    target_states
+        List or comma separated states to wait for (default ACTIVE)
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.servers_wait id1,id2 target_states=ACTIVE,SHUTOFF
+    '''
+    if isinstance(server_ids, six.string_types):
+        server_ids = server_ids.split(',')
+    conn = _authng(profile, tenant_name)
+    ret = conn.servers_wait(server_ids, target_states, timeout)
+    ret['done'] = dict([(server_id, item.status)
+                        for server_id, item in six.iteritems(ret['done'])])
+    return ret
 
 
 def network_show(name, profile=None):
@@ -207,11 +724,21 @@ def network_show(name, profile=None):
     return conn.network_show(name)
 
 
+def network_list(profile=None, tenant_name=None):
+    '''
+    Return networks keyed by label
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.network_list
+    '''
+    conn = _authng(profile, tenant_name)
+    return dict([(network['label'], network) for network in conn.network_list()])
+
+
 def availability_zone_list(profile=None):
     '''
     list existing availability zones
     '''
-    connection_args = get_connection_args(profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     ret = nt_ks.aggregates.list()
@@ -220,25 +747,16 @@ def availability_zone_list(profile=None):
 
 def availability_zone_get(name, profile=None):
     '''
-    list existing availability zones
+    Return aggregate of the availability zone with its hosts and metadata,
+    False if it does not exist
     '''
-    connection_args = get_connection_args(profile)
-    conn = _authng(profile)
-    nt_ks = conn.compute_conn
-    zone_exists=False
-    items = availability_zone_list(profile)
-    for p in items:
-        item = nt_ks.aggregates.get(p).__getattr__('name')
-        if item == name:
-            zone_exists = True
-    return zone_exists
+    return aggregate_show(name, profile) or False
 
 
 def availability_zone_create(name, availability_zone, profile=None):
     '''
     create availability zone
     '''
-    connection_args = get_connection_args(profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     item = nt_ks.aggregates.create(name, availability_zone)
@@ -253,34 +771,34 @@ def aggregate_list(profile=None):
     '''
     list existing aggregates
     '''
-    connection_args = get_connection_args(profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     ret = nt_ks.aggregates.list()
     return ret
 
 
-def aggregate_get(name, profile=None):
+def aggregate_show(name, profile=None):
     '''
-    list existing aggregates
+    Return aggregate with its hosts and metadata, empty dict if missing
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.aggregate_show aggregate1 profile=openstack
     '''
-    connection_args = get_connection_args(profile)
     conn = _authng(profile)
-    nt_ks = conn.compute_conn
-    aggregate_exists=False
-    items = aggregate_list(profile)
-    for p in items:
-        item = nt_ks.aggregates.get(p).__getattr__('name')
-        if item == name:
-            aggregate_exists = True
-    return aggregate_exists
+    return conn.aggregate_index().get(name, {})
+
+
+def aggregate_get(name, profile=None):
+    '''
+    Return aggregate with its hosts and metadata, False if it does not exist
+    '''
+    return aggregate_show(name, profile) or False
 
 
 def aggregate_create(name, aggregate, profile=None):
     '''
     create aggregate
     '''
-    connection_args = get_connection_args(profile)
     conn = _authng(profile)
     nt_ks = conn.compute_conn
     item = nt_ks.aggregates.create(name, aggregate)
@@ -290,6 +808,473 @@ def aggregate_create(name, aggregate, profile=None):
     }
     return ret
 
+def aggregate_add_host(name, host, profile=None, test=False, **kwargs):
+    '''
+    Add a host to a host aggregate unless it is already a member
+
+    Returns True when the host was added, False when it already is a member
+    and None when the aggregate does not exist.
+    name
+        Name of the aggregate
+    host
+        Name of the compute host
+    test
+        Only report whether the host would be added
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.aggregate_add_host aggregate1 cmp01 profile=openstack
+        salt '*' novang.aggregate_add_host aggregate1 cmp01 \
+                connection_user=admin connection_password=secret \
+                connection_tenant=admin connection_auth_url=http://keystone:35357/v2.0
+    '''
+    conn = _authng(profile, **_connection_args(kwargs))
+    aggregate = conn.aggregate_index().get(name)
+    if not aggregate:
+        return None
+    if host in aggregate['hosts']:
+        return False
+    if not test:
+        conn.compute_conn.aggregates.add_host(aggregate['id'], host)
+    return True
+
+def _nova_manage(*args):
+    '''
+    Run nova-manage and return its output, raise on failure
+    '''
+    cmd = ['nova-manage'] + list(args)
+    result = __salt__['cmd.run_all'](cmd, python_shell=False)
+    if result['retcode'] != 0:
+        raise CommandExecutionError('{0} failed: {1}'.format(
+            ' '.join(cmd[:3]), result['stderr'] or result['stdout']))
+    return result['stdout']
+
+
+def _cell_v2_parse(output, key='name'):
+    '''
+    Parse the table printed by nova-manage cell_v2 list_cells or
+    list_hosts, rows are keyed by the key column
+    '''
+    cells = {}
+    header = None
+    for line in output.splitlines():
+        line = line.strip()
+        if not line.startswith('|'):
+            continue
+        columns = [column.strip() for column in line.strip('|').split('|')]
+        if header is None:
+            header = [column.lower().replace(' ', '_') for column in columns]
+            continue
+        cell = dict(zip(header, columns))
+        cells[cell[key]] = cell
+    return cells
+
+
+def _discover_hosts_mapped(output):
+    '''
+    Parse hosts mapped by nova-manage cell_v2 discover_hosts --verbose
+    '''
+    mapped = set()
+    for line in output.splitlines():
+        match = re.search(r"Creating host mapping for "
+                          r"(?:compute host '([^']+)'|service (\S+))", line)
+        if match:
+            mapped.add(match.group(1) or match.group(2))
+    return mapped
+
+
+def _cell_v2_url_mask(url):
+    '''
+    Mask the password of a URL the way nova-manage cell_v2 list_cells does,
+    which replaces everything between the first ":" and the last "@" of the
+    netloc, so only the last member of a multi-host URL stays visible
+    '''
+    netloc = urlparse(url).netloc
+    return url.replace(netloc, re.sub(':.*@', ':****@', netloc), 1)
+
+
+def _cell_v2_url_matches(current, desired, applied=None):
+    '''
+    Compare cell URL from list_cells, which masks passwords, to a desired one
+
+    A password change does not show in list_cells, so a desired URL with a
+    password only matches when its digest equals applied, the digest of the
+    URL last passed to update_cell.
+    '''
+    if not desired:
+        return True
+    current = current.rstrip('/')
+    if current == desired.rstrip('/'):
+        return True
+    if current != _cell_v2_url_mask(desired).rstrip('/'):
+        return False
+    return applied == _cache_key(desired)
+
+
+def cell_v2_list(refresh=False):
+    '''
+    Return nova cells keyed by name
+
+    nova-manage cell_v2 list_cells is run once per job, later calls use the
+    parsed table until a cell_v2 change invalidates it.
+    refresh
+        Run list_cells again
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.cell_v2_list
+    '''
+    if refresh or 'novang.cells' not in __context__:
+        __context__['novang.cells'] = _cell_v2_parse(
+            _nova_manage('cell_v2', 'list_cells'))
+    return __context__['novang.cells']
+
+
+def cell_v2_map_cell0(database_connection=None, test=False):
+    '''
+    Map cell0 unless it is already mapped
+
+    Returns True when cell0 was mapped, False when it already exists.
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.cell_v2_map_cell0
+    '''
+    if 'cell0' in cell_v2_list():
+        return False
+    if not test:
+        args = ['cell_v2', 'map_cell0']
+        if database_connection:
+            args.append('--database_connection=' + database_connection)
+        _nova_manage(*args)
+        __context__.pop('novang.cells', None)
+    return True
+
+
+def cell_v2_create_cell(name, transport_url=None, database_connection=None,
+                        test=False):
+    '''
+    Create a cell unless a cell with that name exists
+
+    Returns True when the cell was created, False when it already exists.
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.cell_v2_create_cell cell1
+    '''
+    if name in cell_v2_list():
+        return False
+    if not test:
+        args = ['cell_v2', 'create_cell', '--name=' + name]
+        if transport_url:
+            args.append('--transport-url=' + transport_url)
+        if database_connection:
+            args.append('--database_connection=' + database_connection)
+        _nova_manage(*args)
+        __context__.pop('novang.cells', None)
+    return True
+
+
+def cell_v2_update_cell(name, transport_url=None, database_connection=None,
+                        test=False):
+    '''
+    Update transport URL and database connection of a cell if they differ
+
+    list_cells masks passwords, so digests of the URLs last applied are kept
+    in the minion cachedir to notice password changes. Returns True when the cell was updated, False when it is up to date and
+    None when the cell does not exist.
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.cell_v2_update_cell cell1 transport_url=rabbit://...
+    '''
+    cell = cell_v2_list().get(name)
+    if cell is None:
+        return None
+    path = _cache_path('cells', cell['uuid'] + '.json')
+    applied = _cache_read(path) or {}
+    if _cell_v2_url_matches(cell.get('transport_url', ''), transport_url,
+                            applied.get('transport_url')) and \
+            _cell_v2_url_matches(cell.get('database_connection', ''),
+                                 database_connection,
+                                 applied.get('database_connection')):
+        return False
+    if not test:
+        args = ['cell_v2', 'update_cell', '--cell_uuid', cell['uuid']]
+        if transport_url:
+            args.extend(['--transport-url', transport_url])
+            applied['transport_url'] = _cache_key(transport_url)
+        if database_connection:
+            args.extend(['--database_connection', database_connection])
+            applied['database_connection'] = _cache_key(database_connection)
+        _nova_manage(*args)
+        _cache_write(path, applied)
+        # the uuid stays the same, keep the table instead of listing again
+        cell['transport_url'] = transport_url or cell.get('transport_url')
+        cell['database_connection'] = database_connection or cell.get('database_connection')
+    return True
+
+
+def cell_v2_map_instances(name):
+    '''
+    Map instances to a cell, returns False when the cell does not exist
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.cell_v2_map_instances cell1
+    '''
+    cell = cell_v2_list().get(name)
+    if cell is None:
+        return False
+    _nova_manage('cell_v2', 'map_instances', '--cell_uuid', cell['uuid'])
+    return True
+
+_DB_VERSIONS_PROBE = '''
+import sys
+from nova import config
+from nova.db import migration
+config.parse_args([sys.argv[0]], init_rpc=False)
+print('%s %s' % (migration.db_version(database='api'), migration.db_version()))
+'''
+
+
+def _db_versions_probe():
+    '''
+    Read api_db and db versions with a single interpreter start, falling
+    back to two nova-manage runs
+    '''
+    nova_manage = __salt__['cmd.which']('nova-manage')
+    if not nova_manage:
+        return {}
+    with salt.utils.fopen(nova_manage) as handle:
+        shebang = handle.readline()
+    if shebang.startswith('#!'):
+        result = __salt__['cmd.run_all'](shebang[2:].split() + ['-c', _DB_VERSIONS_PROBE],
+                                         python_shell=False)
+        try:
+            api_db, db = result['stdout'].strip().splitlines()[-1].split()
+            if result['retcode'] == 0:
+                return {'api_db': int(api_db), 'db': int(db)}
+        except (IndexError, ValueError):
+            pass
+        log.debug('Unable to probe nova db versions: {0}'.format(result['stderr']))
+    try:
+        return {'api_db': int(_nova_manage('api_db', 'version').strip()),
+                'db': int(_nova_manage('db', 'version').strip())}
+    except (CommandExecutionError, ValueError):
+        return {}
+
+
+def db_versions(refresh=False):
+    '''
+    Return schema versions of the nova api_db and db
+
+    Both versions are read with one probe per job and kept up to date by
+    db_sync. Returns empty dict when nova is not installed or configured,
+    a failed probe is not remembered and runs again on the next call.
+    refresh
+        Probe the versions again
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.db_versions
+    '''
+    if refresh or 'novang.db_versions' not in __context__:
+        versions = _db_versions_probe()
+        if not versions:
+            __context__.pop('novang.db_versions', None)
+            return versions
+        __context__['novang.db_versions'] = versions
+    return __context__['novang.db_versions']
+
+
+def db_sync(database='db', version=None):
+    '''
+    Run nova-manage db sync or api_db sync
+    database
+        db or api_db
+    version
+        Schema version to sync to, latest by default
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.db_sync api_db version=20
+    '''
+    args = [database, 'sync']
+    if version is not None:
+        args.extend(['--version', str(version)])
+    _nova_manage(*args)
+    versions = __context__.get('novang.db_versions')
+    if versions and version is not None:
+        versions[database] = int(version)
+    else:
+        __context__.pop('novang.db_versions', None)
+    return True
+
+def compute_hosts(profile=None, **kwargs):
+    '''
+    Return sorted hosts of nova-compute services
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.compute_hosts
+    '''
+    conn = _authng(profile, **_connection_args(kwargs))
+    services = conn.compute_conn.services.list(binary='nova-compute')
+    return sorted(set([service.host for service in services]))
+
+
+def discover_hosts(by_service=False, test=False, profile=None, **kwargs):
+    '''
+    Map new compute hosts to cells
+
+    Compute service hosts are compared with the hosts known to be mapped,
+    kept in the minion cachedir, and nova-manage cell_v2 discover_hosts
+    runs only when new ones appear. Only hosts the discovery reports as
+    mapped, or cell_v2 list_hosts shows, are remembered, the others are
+    tried again on the next call. Returns list of the newly mapped hosts
+    (the new hosts in test mode), or None when the services could not be
+    listed, e.g. before the API is up, and discovery ran unconditionally.
+    by_service
+        Discover hosts from nova-compute services instead of compute nodes
+    test
+        Only report the new hosts
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.discover_hosts by_service=True
+    '''
+    connection_args = _connection_args(kwargs)
+    args = ['cell_v2', 'discover_hosts', '--verbose']
+    if by_service:
+        args.append('--by-service')
+    try:
+        hosts = compute_hosts(profile, **connection_args)
+    except Exception as exc:  # pylint: disable=broad-except
+        log.warning('Unable to list compute services, '
+                    'discovering hosts anyway: {0}'.format(exc))
+        if not test:
+            _nova_manage(*args)
+        return None
+    path = _cache_path('hosts', _cache_key(
+        profile, connection_args.get('connection_auth_url')) + '.json')
+    with _cache_lock(path):
+        known = set(_cache_read(path) or [])
+        new = sorted(set(hosts) - known)
+        if test:
+            return new
+        mapped = set()
+        if new:
+            mapped = _discover_hosts_mapped(_nova_manage(*args)) & set(new)
+        if mapped != set(new):
+            # hosts mapped by an earlier run are not reported again
+            try:
+                mapped.update(set(new) & set(_cell_v2_parse(
+                    _nova_manage('cell_v2', 'list_hosts'), key='hostname')))
+            except CommandExecutionError as exc:
+                log.debug('Unable to list host mappings: {0}'.format(exc))
+        unmapped = sorted(set(new) - mapped)
+        if unmapped:
+            log.warning('Hosts {0} were not mapped to a cell, retrying on the '
+                        'next run'.format(', '.join(unmapped)))
+        confirmed = (known & set(hosts)) | mapped
+        if confirmed != known:
+            _cache_write(path, sorted(confirmed))
+    return sorted(mapped)
+
+
+def _online_data_migrations_parse(output):
+    '''
+    Parse found/done rows per migration from nova-manage
+    db online_data_migrations, either the summary table or the
+    "N rows matched query X, M migrated" lines of older releases
+    '''
+    migrations = {}
+    for line in output.splitlines():
+        line = line.strip()
+        match = re.match(r'(\d+) rows matched query (\S+), (\d+) migrated', line)
+        if match:
+            migrations[match.group(2)] = (int(match.group(1)), int(match.group(3)))
+            continue
+        if not line.startswith('|'):
+            continue
+        columns = [column.strip() for column in line.strip('|').split('|')]
+        if len(columns) >= 3 and columns[1].isdigit() and columns[2].isdigit():
+            migrations[columns[0]] = (int(columns[1]), int(columns[2]))
+    return migrations
+
+
+def online_data_migrations(max_count=1000, budget=600):
+    '''
+    Run online data migrations in batches
+
+    nova-manage db online_data_migrations is run with --max-count until
+    nothing is left to migrate, a batch makes no progress or budget seconds
+    have passed. The budget is checked between batches, so a run can exceed
+    it by one batch. Returns summary with rows migrated per migration,
+    rows migrated per second and whether the migrations are complete.
+    nova-manage only reports rows matched within a batch, so the size of
+    the backlog left after an incomplete run is unknown.
+    max_count
+        Rows migrated per batch
+    budget
+        Wall clock seconds after which no new batch is started
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.online_data_migrations max_count=500 budget=300
+    '''
+    start = time.time()
+    ret = {'complete': False, 'batches': 0, 'migrated': 0, 'migrations': {}}
+    cmd = ['nova-manage', 'db', 'online_data_migrations',
+           '--max-count', str(int(max_count))]
+    while True:
+        result = __salt__['cmd.run_all'](cmd, python_shell=False)
+        migrations = _online_data_migrations_parse(result['stdout'])
+        found = sum([item[0] for item in migrations.values()])
+        done = sum([item[1] for item in migrations.values()])
+        ret['batches'] += 1
+        ret['migrated'] += done
+        for migration, (_, migrated) in six.iteritems(migrations):
+            ret['migrations'][migration] = ret['migrations'].get(migration, 0) + migrated
+        if result['retcode'] not in (0, 1):
+            # some migrations raised, nova-manage tells which on stderr
+            ret['error'] = result['stderr'] or result['stdout']
+            break
+        if result['retcode'] == 0 or found == 0:
+            ret['complete'] = True
+            break
+        if done == 0:
+            ret['error'] = 'No rows migrated in the last batch'
+            break
+        if time.time() - start >= budget:
+            break
+    ret['elapsed'] = round(time.time() - start, 2)
+    ret['rate'] = round(ret['migrated'] / max(ret['elapsed'], 0.01), 1)
+    return ret
+
+def stats(reset=False, fire_event=False, tag='novang/stats'):
+    '''
+    Return API requests made by novang within this job
+
+    Requests are grouped by method and URL path, with ids replaced by {id},
+    each with count, errors, total and maximum latency in seconds and
+    response bytes.
+    reset
+        Start counting from zero again
+    fire_event
+        Also send the statistics as a Salt event
+    tag
+        Tag of the event
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.stats
+    '''
+    with _STATS_LOCK:
+        requests = {}
+        for key, entry in six.iteritems(__context__.get('novang.stats', {})):
+            requests[key] = dict(entry, time=round(entry['time'], 3),
+                                 max=round(entry['max'], 3))
+        if reset:
+            __context__['novang.stats'] = {}
+    ret = {'calls': sum([entry['count'] for entry in requests.values()]),
+           'errors': sum([entry['errors'] for entry in requests.values()]),
+           'time': round(sum([entry['time'] for entry in requests.values()]), 3),
+           'bytes': sum([entry['bytes'] for entry in requests.values()]),
+           'requests': requests}
+    if fire_event:
+        __salt__['event.send'](tag, ret)
+    return ret
+
 #
 # Moved from salt.utils.openstack.nova until this works in upstream
 #
@@ -299,50 +1284,56 @@ Nova class
 '''
 
 # Import Python libs
+import contextlib
+import datetime
+import errno
+import hashlib
 import inspect
+import json
+import os
+import random
+import tempfile
 import time
 
-from distutils.version import LooseVersion as _LooseVersion
-
-# Import third party libs
-import salt.ext.six as six
-HAS_NOVA = False
-# pylint: disable=import-error
+HAS_FCNTL = False
 try:
-    import novaclient
-    from novaclient import client
-    from novaclient.shell import OpenStackComputeShell
-    import novaclient.utils
-    import novaclient.exceptions
-    import novaclient.extension
-    import novaclient.base
-    HAS_NOVA = True
+    import fcntl
+    HAS_FCNTL = True
 except ImportError:
     pass
 
-OCATA = True
-try:
-    import novaclient.auth_plugin
-    OCATA = False
-except ImportError:
-    pass
+import glob
+import re
+import sys
+import threading
+
+# Import third party libs
+import salt.ext.six as six
+from salt.ext.six.moves.urllib.parse import urlencode, urlparse  # pylint: disable=import-error,no-name-in-module
 
+# novaclient and keystoneauth1 are imported on first use by
+# _import_novaclient(), the loader only reads the package metadata
+HAS_NOVA = False
+OCATA = True
 HAS_KEYSTONEAUTH = False
-try:
-    import keystoneauth1.loading
-    import keystoneauth1.session
-    HAS_KEYSTONEAUTH = True
-except ImportError:
-    pass
-# pylint: enable=import-error
+novaclient = None
+client = None
 
 # Import salt libs
 import salt.utils
-from salt.exceptions import SaltCloudSystemExit
+from salt.exceptions import CommandExecutionError, SaltCloudSystemExit
 
 # Version added to novaclient.client.Client function
 NOVACLIENT_MINVER = '2.6.1'
 
+# Page size used when whole server list has to be walked internally
+SERVER_PAGE_SIZE = 1000
+
+# Seconds subtracted from the newest update seen before it is used as
+# changes-since, covering rows updated while earlier pages were read and
+# conductors with clocks slightly behind
+CHANGES_SINCE_OVERLAP = 300
+
 # dict for block_device_mapping_v2
 CLIENT_BDM2_KEYS = {
     'id': 'uuid',
@@ -358,12 +1349,100 @@ CLIENT_BDM2_KEYS = {
 }
 
 
+def _version_tuple(version):
+    '''
+    Return comparable tuple of the leading numeric parts of a version
+    '''
+    ret = []
+    for part in str(version).split('.'):
+        match = re.match(r'\d+', part)
+        if not match:
+            break
+        ret.append(int(match.group()))
+    return tuple(ret)
+
+
+def _novaclient_version():
+    '''
+    Return installed python-novaclient version without importing it
+    '''
+    for path in sys.path:
+        name = os.path.basename(path.rstrip(os.sep))
+        if name.startswith('python_novaclient-') and name.endswith('.egg'):
+            # zipped or unpacked .egg, the egg itself is on sys.path
+            return name.split('-')[1]
+        for pattern in ('python_novaclient-*.egg-info',
+                        'python_novaclient-*.dist-info'):
+            for info in glob.glob(os.path.join(path, pattern)):
+                version = os.path.basename(info).split('-')[1]
+                return re.sub(r'\.(egg|dist)$', '', version)
+    # develop installs and other layouts, slower but still exact
+    try:
+        from importlib import metadata  # pylint: disable=no-name-in-module
+        return metadata.version('python-novaclient')
+    except Exception:  # pylint: disable=broad-except
+        pass
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('python-novaclient').version
+    except Exception:  # pylint: disable=broad-except
+        pass
+    try:
+        _import_novaclient()
+        return novaclient.__version__
+    except ImportError:
+        return None
+
+
+def _import_novaclient():
+    '''
+    Import novaclient and keystoneauth1 when the first SaltNova is built
+    '''
+    global novaclient, client, HAS_NOVA, OCATA, HAS_KEYSTONEAUTH
+    if client is not None:
+        return
+    # pylint: disable=import-error,redefined-outer-name
+    import novaclient
+    import novaclient.utils
+    import novaclient.exceptions
+    import novaclient.extension
+    import novaclient.base
+    from novaclient import client as novaclient_client
+    HAS_NOVA = True
+    try:
+        import novaclient.auth_plugin
+        OCATA = False
+    except ImportError:
+        pass
+    try:
+        import keystoneauth1.loading
+        import keystoneauth1.session
+        HAS_KEYSTONEAUTH = True
+    except ImportError:
+        pass
+    # pylint: enable=import-error,redefined-outer-name
+    client = novaclient_client
+
+
+def _poll_errors():
+    '''
+    Exceptions a wait loop treats as "not seen yet" rather than fatal
+    '''
+    errors = (novaclient.exceptions.ClientException,)
+    try:
+        # pylint: disable=import-error
+        import keystoneauth1.exceptions
+        errors += (keystoneauth1.exceptions.ConnectionError,)
+    except ImportError:
+        pass
+    return errors
+
+
 def check_nova():
-    if HAS_NOVA:
-        novaclient_ver = _LooseVersion(novaclient.__version__)
-        min_ver = _LooseVersion(NOVACLIENT_MINVER)
-        if novaclient_ver >= min_ver:
-            return HAS_NOVA
+    novaclient_ver = _novaclient_version()
+    if novaclient_ver:
+        if _version_tuple(novaclient_ver) >= _version_tuple(NOVACLIENT_MINVER):
+            return True
         log.debug('Newer novaclient version required.  Minimum: {0}'.format(NOVACLIENT_MINVER))
     return False
 
@@ -374,6 +1453,90 @@ class KwargsStruct(object):
         self.__dict__.update(entries)
 
 
+def _changes_since(updated, overlap=CHANGES_SINCE_OVERLAP):
+    '''
+    Return changes-since filter value overlap seconds before updated
+
+    changes-since is inclusive and callers merge idempotently, so the
+    overlap only costs a few repeated servers. Timestamps that cannot be
+    parsed are used as they are.
+    '''
+    try:
+        moment = datetime.datetime.strptime(updated[:19], '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return updated
+    moment -= datetime.timedelta(seconds=overlap)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _backoff(initial=1, maximum=30, factor=2, jitter=0.5):
+    '''
+    Yield exponentially growing delays with random jitter added
+    '''
+    delay = float(initial)
+    while True:
+        yield min(maximum, delay + random.uniform(0, delay * jitter))
+        delay = min(maximum, delay * factor)
+
+
+def _target_states(target_states, default=('ACTIVE',)):
+    '''
+    Normalize list or comma separated string of states to upper case
+    '''
+    if not target_states:
+        target_states = default
+    if isinstance(target_states, six.string_types):
+        target_states = target_states.split(',')
+    return [str(state).strip().upper() for state in target_states]
+
+
+def _wait_for(fetch, ids, target_states=None, timeout=300, initial_delay=1,
+              max_delay=30, kind='Resource'):
+    '''
+    Wait until every resource reaches one of target_states
+
+    fetch is called once per tick with the set of pending ids and returns
+    {id: (status, item, fault)} for those it found. Resources in an ERROR
+    state, or DELETED, fail unless that is a target state. Ticks are spaced
+    with exponential backoff until the deadline.
+    '''
+    target_states = _target_states(target_states)
+    pending = set(ids)
+    done = {}
+    failed = {}
+    deadline = time.time() + timeout
+    delays = _backoff(initial_delay, max_delay)
+    while pending:
+        for resource_id, (status, item, fault) in six.iteritems(fetch(pending)):
+            if resource_id not in pending:
+                continue
+            status = str(status).upper()
+            if status in target_states:
+                done[resource_id] = item
+            elif status.startswith('ERROR') or status == 'DELETED':
+                failed[resource_id] = '{0} state: {1}'.format(status, fault)
+            else:
+                continue
+            pending.discard(resource_id)
+        if not pending:
+            break
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            log.error('Timed out after {0} seconds while waiting for {1}: '
+                      '{2}'.format(timeout, kind.lower(), ', '.join(sorted(pending))))
+            break
+        log.debug('{0}s pending: {1}'.format(kind, len(pending)))
+        time.sleep(min(next(delays), remaining))
+    return {'done': done, 'failed': failed, 'pending': sorted(pending)}
+
+
+def _regex_escape(value):
+    '''
+    Escape regular expression metacharacters for API name filters
+    '''
+    return re.sub(r'([.^$*+?{}\[\]\\|()])', r'\\\1', value)
+
+
 def _parse_block_device_mapping_v2(block_device=None, boot_volume=None, snapshot=None, ephemeral=None, swap=None):
     bdm = []
     if block_device is None:
@@ -519,16 +1682,174 @@ def _format_v2_endpoints(endpoints_v2, services):
             etype = service[0].get('type', '')
             ename = service[0].get('name', '')
 
-        entry = {
-            'type': etype,
-            'name': ename,
-            'id': endpoint.pop('id'),
-            'region': endpoint.get('region'),
-            'endpoints': [endpoint]
-        }
-        catalog.append(entry)
- 
-    return catalog
+        entry = {
+            'type': etype,
+            'name': ename,
+            'id': endpoint.pop('id'),
+            'region': endpoint.get('region'),
+            'endpoints': [endpoint]
+        }
+        catalog.append(entry)
+ 
+    return catalog
+
+
+def _cache_path(*parts):
+    '''
+    Return path of a novang file in the minion cachedir
+    '''
+    cachedir = __opts__.get('cachedir', '/var/cache/salt/minion')
+    return os.path.join(cachedir, 'novang', *parts)
+
+
+def _cache_key(*parts):
+    '''
+    Return file name safe digest of the given cache key parts
+    '''
+    key = ':'.join([str(part) for part in parts])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _cache_makedirs(path):
+    dirname = os.path.dirname(path)
+    try:
+        os.makedirs(dirname, 0o700)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+
+
+def _cache_read(path):
+    '''
+    Read JSON data from cache file, return None if missing or corrupt
+    '''
+    try:
+        with salt.utils.fopen(path, 'r') as fp_:
+            return json.load(fp_)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _cache_write(path, data):
+    '''
+    Atomically replace cache file with JSON data, readable only by owner
+    '''
+    _cache_makedirs(path)
+    fd_, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.novang')
+    try:
+        with os.fdopen(fd_, 'w') as fp_:
+            json.dump(data, fp_)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@contextlib.contextmanager
+def _cache_lock(path):
+    '''
+    Hold exclusive lock on cache file across minion processes
+    '''
+    _cache_makedirs(path)
+    with salt.utils.fopen(path + '.lock', 'a') as fp_:
+        if HAS_FCNTL:
+            fcntl.flock(fp_.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if HAS_FCNTL:
+                fcntl.flock(fp_.fileno(), fcntl.LOCK_UN)
+
+
+def _token_cache_restore(profile, session, refresh=300):
+    '''
+    Load keystone token of the profile from the minion cachedir
+
+    The cached token is used only if it was issued for the same credentials
+    and does not expire within ``refresh`` seconds, otherwise a new token is
+    requested and stored. The lock makes concurrent minion processes wait
+    for a single authentication instead of all of them hitting keystone.
+    '''
+    auth = getattr(session, 'auth', None)
+    if not hasattr(auth, 'get_auth_state'):
+        return
+    try:
+        cache_id = auth.get_cache_id()
+    except NotImplementedError:
+        cache_id = None
+    if not cache_id:
+        return
+    path = _cache_path('tokens', _cache_key(profile, cache_id) + '.json')
+    try:
+        with _cache_lock(path):
+            cached = _cache_read(path) or {}
+            if cached.get('cache_id') == cache_id:
+                auth.set_auth_state(cached.get('auth_state'))
+            if auth.auth_ref is not None and \
+                    not auth.auth_ref.will_expire_soon(refresh):
+                log.debug('Using cached keystone token for {0}'.format(profile))
+                return
+            auth.invalidate()
+            session.get_token()
+            _cache_write(path, {
+                'cache_id': cache_id,
+                'auth_state': auth.get_auth_state(),
+            })
+    except (IOError, OSError) as exc:
+        log.warning('Unable to use keystone token cache: {0}'.format(exc))
+
+
+_STATS_LOCK = threading.Lock()
+_STATS_ID = re.compile(r'^([0-9a-fA-F]{32}|[0-9a-fA-F-]{36}|[0-9]+)$')
+
+
+def _stats_record(method, url, elapsed, status=None, size=0):
+    '''
+    Add one API request to the per method and URL statistics of the job,
+    status is None when no response was received
+    '''
+    path = '/'.join(['{id}' if _STATS_ID.match(part) else part
+                     for part in urlparse(url).path.split('/')])
+    key = '{0} {1}'.format(method.upper(), path)
+    with _STATS_LOCK:
+        stats = __context__.setdefault('novang.stats', {})
+        entry = stats.setdefault(key, {'count': 0, 'errors': 0, 'time': 0.0,
+                                       'max': 0.0, 'bytes': 0})
+        entry['count'] += 1
+        entry['time'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+        entry['bytes'] += size
+        if status is None or status >= 400:
+            entry['errors'] += 1
+
+
+def _stats_instrument(session):
+    '''
+    Time every request made through the keystone session
+    '''
+    if getattr(session, '_novang_stats', False):
+        return
+    request = session.request
+
+    def timed_request(url, method, **kwargs):
+        start = time.time()
+        response = None
+        try:
+            response = request(url, method, **kwargs)
+            return response
+        finally:
+            status, size = None, 0
+            if response is not None:
+                status = response.status_code
+                size = int(response.headers.get('Content-Length') or
+                           len(response.content or ''))
+            _stats_record(method, url, time.time() - start, status, size)
+
+    session.request = timed_request
+    session._novang_stats = True
 
 
 # Function alias to not shadow built-ins
@@ -549,20 +1870,36 @@ class SaltNova(object):
         use_keystoneauth=False,
         verify=True,
         profile=None,
+        token_cache=False,
+        token_cache_refresh=300,
         **kwargs
     ):
         '''
         Set up nova credentials
         '''
 
-        self._keystoneng_init(profile=profile, **kwargs)
+        self._keystoneng_init(profile=profile, token_cache=token_cache,
+                              token_cache_refresh=token_cache_refresh,
+                              project_id=project_id, region_name=region_name,
+                              **kwargs)
 
-    def _keystoneng_init(self, profile, **kwargs):
+    def _keystoneng_init(self, profile, token_cache=False,
+                         token_cache_refresh=300, project_id=None,
+                         region_name=None, **kwargs):
+        _import_novaclient()
+        if project_id:
+            kwargs['connection_tenant'] = project_id
         kstone = __salt__['keystoneng.auth'](profile, **kwargs)
         self.session = kstone.session
+        _stats_instrument(self.session)
+        if token_cache:
+            _token_cache_restore(profile, self.session,
+                                 int(token_cache_refresh))
         self.version = str(kwargs.get('version', 2))
-        self.compute_conn = client.Client(version=self.version, session=self.session)
-        self.volume_conn = client.Client(version=self.version, session=self.session)
+        self.compute_conn = client.Client(version=self.version, session=self.session,
+                                          region_name=region_name)
+        self.volume_conn = client.Client(version=self.version, session=self.session,
+                                         region_name=region_name)
 
     def expand_extensions(self):
         for connection in (self.compute_conn, self.volume_conn):
@@ -597,10 +1934,27 @@ class SaltNova(object):
 
         return ret
 
-    def boot(self, name, flavor_id=0, image_id=0, timeout=300, **kwargs):
+    def boot(self, name, flavor_id=0, image_id=0, timeout=300,
+             target_states=None, **kwargs):
         '''
         Boot a cloud server.
         '''
+        self.uuid, name, self.password = self.boot_create(
+            name, flavor_id, image_id, **kwargs)[0]
+
+        item = self.server_wait(self.uuid, target_states, timeout)
+        if not item:
+            return False
+        return NovaServer(item.name, self._server_detailed(item), self.password)
+
+    def boot_create(self, name, flavor_id=0, image_id=0, count=None, **kwargs):
+        '''
+        Submit a server create request without waiting for the servers
+
+        With count above 1 the servers are requested with a single call using
+        min_count/max_count and looked up by the returned reservation id.
+        Returns list of (id, name, password) of the new servers.
+        '''
         nt_ks = self.compute_conn
         kwargs['name'] = name
         kwargs['flavor'] = flavor_id
@@ -614,29 +1968,88 @@ class SaltNova(object):
             block_device=block_device, boot_volume=boot_volume, snapshot=snapshot,
             ephemeral=ephemeral, swap=swap
         )
+        if count and int(count) > 1:
+            kwargs['min_count'] = kwargs['max_count'] = int(count)
+            kwargs['reservation_id'] = True
+            response = nt_ks.servers.create(**kwargs)
+            reservation_id = getattr(response, 'reservation_id', response)
+            return [(item.id, item.name, None) for item in self._server_iter(
+                detailed=False, search_opts={'reservation_id': str(reservation_id)},
+                page_size=SERVER_PAGE_SIZE)]
         response = nt_ks.servers.create(**kwargs)
-        self.uuid = response.id
-        self.password = getattr(response, 'adminPass', None)
+        return [(response.id, name, getattr(response, 'adminPass', None))]
 
-        start = time.time()
-        trycount = 0
-        while True:
-            trycount += 1
+    def server_wait(self, server_id, target_states=None, timeout=300,
+                    initial_delay=1, max_delay=30):
+        '''
+        Wait until a server reaches one of target_states (default ACTIVE)
+
+        ERROR fails fast with the fault message unless it is one of the
+        target states. Returns the server or False when the deadline passes.
+        '''
+        ret = self.servers_wait([server_id], target_states, timeout,
+                                initial_delay, max_delay)
+        if server_id in ret['failed']:
+            raise SaltCloudSystemExit('Server {0} went to {1}'.format(
+                server_id, ret['failed'][server_id]))
+        return ret['done'].get(server_id, False)
+
+    def servers_wait(self, server_ids, target_states=None, timeout=300,
+                     initial_delay=1, max_delay=30, since=None,
+                     page_size=SERVER_PAGE_SIZE):
+        '''
+        Wait for many servers at once
+
+        Every tick issues a single servers.list request, limited with the
+        changes-since filter to servers updated since CHANGES_SINCE_OVERLAP
+        seconds before the newest update seen on the previous tick, or a
+        single GET when only one server is left.
+        since may be passed to skip the full listing on the first tick when
+        the servers are known to have changed after that time, e.g. were
+        just created. API and connection errors count as not seen yet and
+        are retried until the deadline. Returns dict with done, failed and
+        pending servers.
+        '''
+        nt_ks = self.compute_conn
+        watermark = {'since': since}
+
+        def fetch(pending):
+            ret = {}
             try:
-                return self.server_show_libcloud(self.uuid)
-            except Exception as exc:
-                log.debug(
-                    'Server information not yet available: {0}'.format(exc)
-                )
-                time.sleep(1)
-                if time.time() - start > timeout:
-                    log.error('Timed out after {0} seconds '
-                              'while waiting for data'.format(timeout))
-                    return False
-
-                log.debug(
-                    'Retrying server_show() (try {0})'.format(trycount)
-                )
+                if len(pending) == 1:
+                    server_id = list(pending)[0]
+                    try:
+                        items = [nt_ks.servers.get(server_id)]
+                    except novaclient.exceptions.NotFound:
+                        items = []
+                else:
+                    search_opts = None
+                    if watermark['since']:
+                        search_opts = {
+                            'changes-since': _changes_since(watermark['since'])}
+                    items = self._server_iter(search_opts=search_opts,
+                                              page_size=page_size)
+                newest = watermark['since']
+                for item in items:
+                    updated = getattr(item, 'updated', None)
+                    if len(pending) > 1 and updated and \
+                            (not newest or updated > newest):
+                        newest = updated
+                    if item.id not in pending:
+                        continue
+                    fault = getattr(item, 'fault', None) or {}
+                    ret[item.id] = (item.status, item,
+                                    fault.get('message', 'no fault reported'))
+                # only move the watermark once the whole listing was read
+                watermark['since'] = newest
+            except _poll_errors() as exc:
+                # servers seen before the error are kept, the rest are
+                # polled again on the next tick until the deadline
+                log.debug('Unable to poll servers, retrying: {0}'.format(exc))
+            return ret
+
+        return _wait_for(fetch, server_ids, target_states, timeout,
+                         initial_delay, max_delay, 'Server')
 
     def show_instance(self, name):
         '''
@@ -655,9 +2068,37 @@ class SaltNova(object):
         '''
         Find a server by its name
         '''
-        return self.server_show_libcloud(
-            self.server_list().get(name, {}).get('id', '')
-        )
+        item = self._server_find(name)
+        if item is None:
+            raise SaltCloudSystemExit('Unable to find server {0}.'.format(name))
+        if not hasattr(self, 'password'):
+            self.password = None
+        return NovaServer(item.name, self._server_detailed(item), self.password)
+
+    def _servers_by_name(self, name, detailed=True):
+        '''
+        Return all servers named exactly ``name``
+
+        The compute API treats the name filter as a regular expression, so it
+        is anchored and escaped, and the result is checked for equality.
+        '''
+        search_opts = {'name': '^{0}$'.format(_regex_escape(name))}
+        return [item for item in self._server_iter(detailed=detailed,
+                                                   search_opts=search_opts)
+                if item.name == name]
+
+    def _server_find(self, name, detailed=True):
+        '''
+        Return the single server named ``name`` or None
+        '''
+        items = self._servers_by_name(name, detailed=detailed)
+        if len(items) > 1:
+            raise SaltCloudSystemExit(
+                'Multiple servers named {0} found: {1}'.format(
+                    name, ', '.join([str(item.id) for item in items])))
+        if items:
+            return items[0]
+        return None
 
     def _volume_get(self, volume_id):
         '''
@@ -666,15 +2107,19 @@ class SaltNova(object):
         if self.volume_conn is None:
             raise SaltCloudSystemExit('No cinder endpoint available')
         nt_ks = self.volume_conn
-        volume = nt_ks.volumes.get(volume_id)
-        response = {'name': volume.display_name,
-                    'size': volume.size,
-                    'id': volume.id,
-                    'description': volume.display_description,
-                    'attachments': volume.attachments,
-                    'status': volume.status
-                    }
-        return response
+        return self._volume_dict(nt_ks.volumes.get(volume_id))
+
+    def _volume_dict(self, volume):
+        '''
+        Format one volume
+        '''
+        return {'name': volume.display_name,
+                'size': volume.size,
+                'id': volume.id,
+                'description': volume.display_description,
+                'attachments': volume.attachments,
+                'status': volume.status
+                }
 
     def volume_list(self, search_opts=None):
         '''
@@ -686,14 +2131,7 @@ class SaltNova(object):
         volumes = nt_ks.volumes.list(search_opts=search_opts)
         response = {}
         for volume in volumes:
-            response[volume.display_name] = {
-                'name': volume.display_name,
-                'size': volume.size,
-                'id': volume.id,
-                'description': volume.display_description,
-                'attachments': volume.attachments,
-                'status': volume.status
-            }
+            response[volume.display_name] = self._volume_dict(volume)
         return response
 
     def volume_show(self, name):
@@ -748,6 +2186,31 @@ class SaltNova(object):
         response = nt_ks.volumes.delete(volume['id'])
         return volume
 
+    def volumes_wait(self, volume_ids, target_states=None, timeout=300,
+                     initial_delay=1, max_delay=30):
+        '''
+        Wait for volumes to reach one of target_states
+
+        Every tick issues one GET per pending volume, the volumes are never
+        listed. Returns dict with done, failed and pending volumes.
+        '''
+        if self.volume_conn is None:
+            raise SaltCloudSystemExit('No cinder endpoint available')
+        nt_ks = self.volume_conn
+
+        def fetch(pending):
+            ret = {}
+            for volume_id in pending:
+                try:
+                    item = nt_ks.volumes.get(volume_id)
+                except novaclient.exceptions.NotFound:
+                    continue
+                ret[item.id] = (item.status, item, item.status)
+            return ret
+
+        return _wait_for(fetch, volume_ids, target_states or ('available',),
+                         timeout, initial_delay, max_delay, 'Volume')
+
     def volume_detach(self,
                       name,
                       timeout=300):
@@ -764,25 +2227,10 @@ class SaltNova(object):
             volume['attachments'][0]['server_id'],
             volume['attachments'][0]['id']
         )
-        trycount = 0
-        start = time.time()
-        while True:
-            trycount += 1
-            try:
-                response = self._volume_get(volume['id'])
-                if response['status'] == 'available':
-                    return response
-            except Exception as exc:
-                log.debug('Volume is detaching: {0}'.format(name))
-                time.sleep(1)
-                if time.time() - start > timeout:
-                    log.error('Timed out after {0} seconds '
-                              'while waiting for data'.format(timeout))
-                    return False
-
-                log.debug(
-                    'Retrying volume_show() (try {0})'.format(trycount)
-                )
+        ret = self.volumes_wait([volume['id']], ['available'], timeout)
+        if volume['id'] not in ret['done']:
+            return False
+        return self._volume_get(volume['id'])
 
     def volume_attach(self,
                       name,
@@ -802,25 +2250,10 @@ class SaltNova(object):
             volume['id'],
             device=device
         )
-        trycount = 0
-        start = time.time()
-        while True:
-            trycount += 1
-            try:
-                response = self._volume_get(volume['id'])
-                if response['status'] == 'in-use':
-                    return response
-            except Exception as exc:
-                log.debug('Volume is attaching: {0}'.format(name))
-                time.sleep(1)
-                if time.time() - start > timeout:
-                    log.error('Timed out after {0} seconds '
-                              'while waiting for data'.format(timeout))
-                    return False
-
-                log.debug(
-                    'Retrying volume_show() (try {0})'.format(trycount)
-                )
+        ret = self.volumes_wait([volume['id']], ['in-use'], timeout)
+        if volume['id'] not in ret['done']:
+            return False
+        return self._volume_get(volume['id'])
 
     def suspend(self, instance_id):
         '''
@@ -854,6 +2287,22 @@ class SaltNova(object):
         response = nt_ks.servers.delete(instance_id)
         return True
 
+    def aggregate_index(self):
+        '''
+        Return host aggregates keyed by name from a single listing
+        '''
+        nt_ks = self.compute_conn
+        ret = {}
+        for aggregate in nt_ks.aggregates.list():
+            ret[aggregate.name] = {
+                'id': aggregate.id,
+                'name': aggregate.name,
+                'availability_zone': getattr(aggregate, 'availability_zone', None),
+                'hosts': list(getattr(aggregate, 'hosts', None) or []),
+                'metadata': dict(getattr(aggregate, 'metadata', None) or {}),
+            }
+        return ret
+
     def flavor_list(self):
         '''
         Return a list of available flavors (nova flavor-list)
@@ -861,20 +2310,27 @@ class SaltNova(object):
         nt_ks = self.compute_conn
         ret = {}
         for flavor in nt_ks.flavors.list():
-            links = {}
-            for link in flavor.links:
-                links[link['rel']] = link['href']
-            ret[flavor.name] = {
-                'disk': flavor.disk,
-                'id': flavor.id,
-                'name': flavor.name,
-                'ram': flavor.ram,
-                'swap': flavor.swap,
-                'vcpus': flavor.vcpus,
-                'links': links,
-            }
-            if hasattr(flavor, 'rxtx_factor'):
-                ret[flavor.name]['rxtx_factor'] = flavor.rxtx_factor
+            ret[flavor.name] = self._flavor_dict(flavor)
+        return ret
+
+    def _flavor_dict(self, flavor):
+        '''
+        Format one flavor
+        '''
+        links = {}
+        for link in flavor.links:
+            links[link['rel']] = link['href']
+        ret = {
+            'disk': flavor.disk,
+            'id': flavor.id,
+            'name': flavor.name,
+            'ram': flavor.ram,
+            'swap': flavor.swap,
+            'vcpus': flavor.vcpus,
+            'links': links,
+        }
+        if hasattr(flavor, 'rxtx_factor'):
+            ret['rxtx_factor'] = flavor.rxtx_factor
         return ret
 
     list_sizes = flavor_list
@@ -948,6 +2404,12 @@ class SaltNova(object):
         '''
         nt_ks = self.compute_conn
         image = nt_ks.images.get(image_id)
+        return self._image_dict(image)
+
+    def _image_dict(self, image):
+        '''
+        Format one image
+        '''
         links = {}
         for link in image.links:
             links[link['rel']] = link['href']
@@ -965,37 +2427,40 @@ class SaltNova(object):
             ret['minDisk'] = image.minDisk
         if hasattr(image, 'minRam'):
             ret['minRam'] = image.minRam
-
         return ret
 
+    def _images_by_name(self, name):
+        '''
+        Return images named exactly ``name`` using the API name filter
+        '''
+        nt_ks = self.compute_conn
+        query = urlencode({'name': name})
+        images = nt_ks.images._list('/images/detail?{0}'.format(query), 'images')
+        return [image for image in images if image.name == name]
+
     def image_list(self, name=None):
         '''
         List server images
         '''
         nt_ks = self.compute_conn
         ret = {}
-        for image in nt_ks.images.list():
-            links = {}
-            for link in image.links:
-                links[link['rel']] = link['href']
-            ret[image.name] = {
-                'name': image.name,
-                'id': image.id,
-                'status': image.status,
-                'progress': image.progress,
-                'created': image.created,
-                'updated': image.updated,
-                'metadata': image.metadata,
-                'links': links,
-            }
-            if hasattr(image, 'minDisk'):
-                ret[image.name]['minDisk'] = image.minDisk
-            if hasattr(image, 'minRam'):
-                ret[image.name]['minRam'] = image.minRam
         if name:
-            return {name: ret[name]}
+            for image in self._images_by_name(name):
+                ret[image.name] = self._image_dict(image)
+            return ret
+        for image in nt_ks.images.list():
+            ret[image.name] = self._image_dict(image)
         return ret
 
+    def _image_id_from_name(self, name):
+        '''
+        Get image id from name, None when missing or ambiguous
+        '''
+        images = self._images_by_name(name)
+        if len(images) != 1:
+            return None
+        return images[0].id
+
     list_images = image_list
 
     def image_meta_set(self,
@@ -1007,9 +2472,7 @@ class SaltNova(object):
         '''
         nt_ks = self.compute_conn
         if name:
-            for image in nt_ks.images.list():
-                if image.name == name:
-                    image_id = image.id  # pylint: disable=C0103
+            image_id = self._image_id_from_name(name)  # pylint: disable=C0103
         if not image_id:
             return {'Error': 'A valid image name or id was not specified'}
         nt_ks.images.set_meta(image_id, kwargs)
@@ -1024,45 +2487,130 @@ class SaltNova(object):
         '''
         nt_ks = self.compute_conn
         if name:
-            for image in nt_ks.images.list():
-                if image.name == name:
-                    image_id = image.id  # pylint: disable=C0103
+            image_id = self._image_id_from_name(name)  # pylint: disable=C0103
         pairs = keys.split(',')
         if not image_id:
             return {'Error': 'A valid image name or id was not specified'}
         nt_ks.images.delete_meta(image_id, pairs)
         return {image_id: 'Deleted: {0}'.format(pairs)}
 
-    def server_list(self):
+    def _server_iter(self, detailed=True, search_opts=None, page_size=None):
         '''
-        List servers
+        Iterate over servers
+
+        With page_size set the API is walked with limit/marker, so only one
+        page of servers is fetched and decoded at a time. Memory stays flat
+        only for callers that consume the servers one by one, the server_list
+        functions still collect all of them.
         '''
         nt_ks = self.compute_conn
+        if not page_size:
+            for item in nt_ks.servers.list(detailed=detailed,
+                                           search_opts=search_opts):
+                yield item
+            return
+        marker = None
+        while True:
+            page = nt_ks.servers.list(detailed=detailed,
+                                      search_opts=search_opts,
+                                      marker=marker,
+                                      limit=int(page_size))
+            if not page:
+                return
+            for item in page:
+                yield item
+            marker = page[-1].id
+
+    def _server_summary(self, item):
+        '''
+        Format one server for server_list
+        '''
+        return {
+            'id': item.id,
+            'name': item.name,
+            'state': item.status,
+            'accessIPv4': item.accessIPv4,
+            'accessIPv6': item.accessIPv6,
+            'flavor': {'id': item.flavor['id'],
+                       'links': item.flavor['links']},
+            'image': {'id': item.image['id'] if item.image else 'Boot From Volume',
+                      'links': item.image['links'] if item.image else ''},
+            }
+
+    def _server_detailed(self, item):
+        '''
+        Format one server for server_list_detailed
+        '''
+        ret = {
+            'OS-EXT-SRV-ATTR': {},
+            'OS-EXT-STS': {},
+            'accessIPv4': item.accessIPv4,
+            'accessIPv6': item.accessIPv6,
+            'addresses': item.addresses,
+            'created': item.created,
+            'flavor': {'id': item.flavor['id'],
+                       'links': item.flavor['links']},
+            'hostId': item.hostId,
+            'id': item.id,
+            'image': {'id': item.image['id'] if item.image else 'Boot From Volume',
+                      'links': item.image['links'] if item.image else ''},
+            'key_name': item.key_name,
+            'links': item.links,
+            'metadata': item.metadata,
+            'name': item.name,
+            'state': item.status,
+            'tenant_id': item.tenant_id,
+            'updated': item.updated,
+            'user_id': item.user_id,
+        }
+
+        ret['progress'] = getattr(item, 'progress', '0')
+
+        if hasattr(item.__dict__, 'OS-DCF:diskConfig'):
+            ret['OS-DCF'] = {
+                'diskConfig': item.__dict__['OS-DCF:diskConfig']
+            }
+        if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:host'):
+            ret['OS-EXT-SRV-ATTR']['host'] = \
+                item.__dict__['OS-EXT-SRV-ATTR:host']
+        if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:hypervisor_hostname'):
+            ret['OS-EXT-SRV-ATTR']['hypervisor_hostname'] = \
+                item.__dict__['OS-EXT-SRV-ATTR:hypervisor_hostname']
+        if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:instance_name'):
+            ret['OS-EXT-SRV-ATTR']['instance_name'] = \
+                item.__dict__['OS-EXT-SRV-ATTR:instance_name']
+        if hasattr(item.__dict__, 'OS-EXT-STS:power_state'):
+            ret['OS-EXT-STS']['power_state'] = \
+                item.__dict__['OS-EXT-STS:power_state']
+        if hasattr(item.__dict__, 'OS-EXT-STS:task_state'):
+            ret['OS-EXT-STS']['task_state'] = \
+                item.__dict__['OS-EXT-STS:task_state']
+        if hasattr(item.__dict__, 'OS-EXT-STS:vm_state'):
+            ret['OS-EXT-STS']['vm_state'] = \
+                item.__dict__['OS-EXT-STS:vm_state']
+        if hasattr(item.__dict__, 'security_groups'):
+            ret['security_groups'] = \
+                item.__dict__['security_groups']
+        return ret
+
+    def server_list(self, page_size=None):
+        '''
+        List servers
+        '''
         ret = {}
-        for item in nt_ks.servers.list():
+        for item in self._server_iter(page_size=page_size):
             try:
-                ret[item.name] = {
-                    'id': item.id,
-                    'name': item.name,
-                    'state': item.status,
-                    'accessIPv4': item.accessIPv4,
-                    'accessIPv6': item.accessIPv6,
-                    'flavor': {'id': item.flavor['id'],
-                               'links': item.flavor['links']},
-                    'image': {'id': item.image['id'] if item.image else 'Boot From Volume',
-                              'links': item.image['links'] if item.image else ''},
-                    }
+                ret[item.name] = self._server_summary(item)
             except TypeError:
                 pass
         return ret
 
-    def server_list_min(self):
+    def server_list_min(self, page_size=None):
         '''
         List minimal information about servers
         '''
-        nt_ks = self.compute_conn
         ret = {}
-        for item in nt_ks.servers.list(detailed=False):
+        for item in self._server_iter(detailed=False, page_size=page_size):
             try:
                 ret[item.name] = {
                     'id': item.id,
@@ -1072,80 +2620,114 @@ class SaltNova(object):
                 pass
         return ret
 
-    def server_list_detailed(self):
+    def server_list_detailed(self, page_size=None):
         '''
         Detailed list of servers
         '''
-        nt_ks = self.compute_conn
         ret = {}
-        for item in nt_ks.servers.list():
+        for item in self._server_iter(page_size=page_size):
             try:
-                ret[item.name] = {
-                    'OS-EXT-SRV-ATTR': {},
-                    'OS-EXT-STS': {},
-                    'accessIPv4': item.accessIPv4,
-                    'accessIPv6': item.accessIPv6,
-                    'addresses': item.addresses,
-                    'created': item.created,
-                    'flavor': {'id': item.flavor['id'],
-                               'links': item.flavor['links']},
-                    'hostId': item.hostId,
-                    'id': item.id,
-                    'image': {'id': item.image['id'] if item.image else 'Boot From Volume',
-                              'links': item.image['links'] if item.image else ''},
-                    'key_name': item.key_name,
-                    'links': item.links,
-                    'metadata': item.metadata,
-                    'name': item.name,
-                    'state': item.status,
-                    'tenant_id': item.tenant_id,
-                    'updated': item.updated,
-                    'user_id': item.user_id,
-                }
+                ret[item.name] = self._server_detailed(item)
             except TypeError:
                 continue
+        return ret
 
-            ret[item.name]['progress'] = getattr(item, 'progress', '0')
+    def batch_shape(self, operation, result):
+        '''
+        Format the raw API result of a novang.batch call like the matching
+        SaltNova method formats it
+        '''
+        if operation == 'server_list_detailed':
+            return dict([(item['name'], self._server_detailed(KwargsStruct(**item)))
+                         for item in result])
+        if operation == 'flavor_list':
+            return dict([(item['name'], self._flavor_dict(KwargsStruct(**item)))
+                         for item in result])
+        if operation == 'image_list':
+            return dict([(item['name'], self._image_dict(KwargsStruct(**item)))
+                         for item in result])
+        if operation == 'floating_ip_list':
+            return dict([(item['ip'], self._floating_ip_dict(KwargsStruct(**item)))
+                         for item in result])
+        if operation == 'volume_list':
+            # the compute volume proxy names the fields in camel case
+            volumes = [KwargsStruct(display_name=item.get('displayName'),
+                                    display_description=item.get('displayDescription'),
+                                    **item) for item in result]
+            return dict([(volume.display_name, self._volume_dict(volume))
+                         for volume in volumes])
+        if operation == 'boot':
+            return {'id': result['id'], 'password': result.get('adminPass')}
+        if operation == 'server_delete':
+            return True
+        return result
 
-            if hasattr(item.__dict__, 'OS-DCF:diskConfig'):
-                ret[item.name]['OS-DCF'] = {
-                    'diskConfig': item.__dict__['OS-DCF:diskConfig']
-                }
-            if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:host'):
-                ret[item.name]['OS-EXT-SRV-ATTR']['host'] = \
-                    item.__dict__['OS-EXT-SRV-ATTR:host']
-            if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:hypervisor_hostname'):
-                ret[item.name]['OS-EXT-SRV-ATTR']['hypervisor_hostname'] = \
-                    item.__dict__['OS-EXT-SRV-ATTR:hypervisor_hostname']
-            if hasattr(item.__dict__, 'OS-EXT-SRV-ATTR:instance_name'):
-                ret[item.name]['OS-EXT-SRV-ATTR']['instance_name'] = \
-                    item.__dict__['OS-EXT-SRV-ATTR:instance_name']
-            if hasattr(item.__dict__, 'OS-EXT-STS:power_state'):
-                ret[item.name]['OS-EXT-STS']['power_state'] = \
-                    item.__dict__['OS-EXT-STS:power_state']
-            if hasattr(item.__dict__, 'OS-EXT-STS:task_state'):
-                ret[item.name]['OS-EXT-STS']['task_state'] = \
-                    item.__dict__['OS-EXT-STS:task_state']
-            if hasattr(item.__dict__, 'OS-EXT-STS:vm_state'):
-                ret[item.name]['OS-EXT-STS']['vm_state'] = \
-                    item.__dict__['OS-EXT-STS:vm_state']
-            if hasattr(item.__dict__, 'security_groups'):
-                ret[item.name]['security_groups'] = \
-                    item.__dict__['security_groups']
-        return ret
+    def server_inventory_sync(self, inventory=None, page_size=SERVER_PAGE_SIZE):
+        '''
+        Bring a server inventory up to date
+
+        Without a previous inventory all servers are listed. Otherwise only
+        servers changed since the inventory watermark are requested with the
+        changes-since filter, starting CHANGES_SINCE_OVERLAP seconds before
+        the watermark, and deleted servers, which the API reports with
+        DELETED status, are dropped from the inventory.
+        '''
+        if not inventory or not inventory.get('watermark'):
+            inventory = {'watermark': None, 'servers': {}}
+            search_opts = None
+        else:
+            search_opts = {'changes-since': _changes_since(inventory['watermark'])}
+        servers = inventory['servers']
+        watermark = inventory['watermark']
+        for item in self._server_iter(search_opts=search_opts,
+                                      page_size=page_size):
+            updated = getattr(item, 'updated', None)
+            if updated and (watermark is None or updated > watermark):
+                watermark = updated
+            if getattr(item, 'status', None) == 'DELETED':
+                servers.pop(item.id, None)
+                continue
+            try:
+                servers[item.id] = self._server_detailed(item)
+            except TypeError:
+                continue
+        inventory['watermark'] = watermark
+        return inventory
 
     def server_show(self, server_id):
         '''
         Show details of one server
         '''
-        ret = {}
+        if not server_id:
+            return {}
+        nt_ks = self.compute_conn
+        try:
+            item = nt_ks.servers.get(server_id)
+        except novaclient.exceptions.NotFound:
+            return {}
+        except novaclient.exceptions.ClientException as exc:
+            log.debug('Unable to get server {0} directly, '
+                      'searching server list: {1}'.format(server_id, exc))
+            return self._server_show_from_list(server_id)
         try:
-            servers = self.server_list_detailed()
-        except AttributeError:
-            raise SaltCloudSystemExit('Corrupt server in server_list_detailed. Remove corrupt servers.')
-        for server_name, server in six.iteritems(servers):
-            if str(server['id']) == server_id:
-                ret[server_name] = server
+            return {item.name: self._server_detailed(item)}
+        except (AttributeError, TypeError):
+            raise SaltCloudSystemExit('Corrupt server {0}.'.format(server_id))
+
+    def _server_show_from_list(self, server_id):
+        '''
+        Find one server by walking the detailed server list
+        '''
+        ret = {}
+        for item in self._server_iter(page_size=SERVER_PAGE_SIZE):
+            if str(item.id) != str(server_id):
+                continue
+            try:
+                ret[item.name] = self._server_detailed(item)
+            except AttributeError:
+                raise SaltCloudSystemExit('Corrupt server in server_list_detailed. Remove corrupt servers.')
+            except TypeError:
+                continue
         return ret
 
     def secgroup_create(self, name, description):
@@ -1247,7 +2829,10 @@ class SaltNova(object):
         '''
         Get server uuid from name
         '''
-        return self.server_list().get(name, {}).get('id', '')
+        item = self._server_find(name, detailed=False)
+        if item is None:
+            return ''
+        return item.id
 
     def virtual_interface_list(self, name):
         '''
@@ -1283,35 +2868,46 @@ class SaltNova(object):
             }
         return response
 
+    def _floating_ip_dict(self, floating_ip):
+        '''
+        Format one floating IP
+        '''
+        return {
+            'ip': floating_ip.ip,
+            'fixed_ip': floating_ip.fixed_ip,
+            'id': floating_ip.id,
+            'instance_id': floating_ip.instance_id,
+            'pool': floating_ip.pool
+        }
+
+    def _floating_ip_index(self, refresh=False):
+        '''
+        Return floating IPs keyed by address
+
+        The index is listed once per connection and mutating calls update
+        it in place instead of listing all floating IPs again.
+        '''
+        if refresh or getattr(self, '_floating_ips', None) is None:
+            nt_ks = self.compute_conn
+            self._floating_ips = {}
+            for floating_ip in nt_ks.floating_ips.list():
+                self._floating_ips[floating_ip.ip] = \
+                    self._floating_ip_dict(floating_ip)
+        return self._floating_ips
+
     def floating_ip_list(self):
         '''
         List floating IPs
         .. versionadded:: 2016.3.0
         '''
-        nt_ks = self.compute_conn
-        floating_ips = nt_ks.floating_ips.list()
-        response = {}
-        for floating_ip in floating_ips:
-            response[floating_ip.ip] = {
-                'ip': floating_ip.ip,
-                'fixed_ip': floating_ip.fixed_ip,
-                'id': floating_ip.id,
-                'instance_id': floating_ip.instance_id,
-                'pool': floating_ip.pool
-            }
-        return response
+        return dict(self._floating_ip_index(refresh=True))
 
     def floating_ip_show(self, ip):
         '''
         Show info on specific floating IP
         .. versionadded:: 2016.3.0
         '''
-        nt_ks = self.compute_conn
-        floating_ips = nt_ks.floating_ips.list()
-        for floating_ip in floating_ips:
-            if floating_ip.ip == ip:
-                return floating_ip
-        return {}
+        return self._floating_ip_index().get(ip, {})
 
     def floating_ip_create(self, pool=None):
         '''
@@ -1320,13 +2916,9 @@ class SaltNova(object):
         '''
         nt_ks = self.compute_conn
         floating_ip = nt_ks.floating_ips.create(pool)
-        response = {
-            'ip': floating_ip.ip,
-            'fixed_ip': floating_ip.fixed_ip,
-            'id': floating_ip.id,
-            'instance_id': floating_ip.instance_id,
-            'pool': floating_ip.pool
-        }
+        response = self._floating_ip_dict(floating_ip)
+        if getattr(self, '_floating_ips', None) is not None:
+            self._floating_ips[response['ip']] = response
         return response
 
     def floating_ip_delete(self, floating_ip):
@@ -1335,19 +2927,51 @@ class SaltNova(object):
         .. versionadded:: 2016.3.0
         '''
         ip = self.floating_ip_show(floating_ip)
+        if not ip:
+            raise SaltCloudSystemExit('Unable to find floating IP {0}.'.format(floating_ip))
         nt_ks = self.compute_conn
-        return nt_ks.floating_ips.delete(ip)
+        response = nt_ks.floating_ips.delete(ip['id'])
+        self._floating_ip_index().pop(floating_ip, None)
+        return response
+
+    def _floating_ip_update(self, floating_ip, instance_id, fixed_ip=None):
+        '''
+        Return a floating IP after (dis)association without listing them all
 
-    def floating_ip_associate(self, server_name, floating_ip):
+        When the id is known from a loaded index the floating IP is read
+        back with one GET and the index updated. Otherwise only what is
+        known is returned: the fixed IP is left out when nova picked it, and
+        a loaded index missing the address is dropped to be listed again.
+        '''
+        index = getattr(self, '_floating_ips', None)
+        known = (index or {}).get(floating_ip, {})
+        if known.get('id') is not None:
+            try:
+                item = self.compute_conn.floating_ips.get(known['id'])
+            except novaclient.exceptions.ClientException as exc:
+                log.debug('Unable to get floating IP {0}: {1}'.format(
+                    floating_ip, exc))
+            else:
+                index[floating_ip] = self._floating_ip_dict(item)
+                return index[floating_ip]
+        if index is not None:
+            self._floating_ips = None
+        ret = {'ip': floating_ip, 'instance_id': instance_id}
+        if instance_id is None or fixed_ip is not None:
+            ret['fixed_ip'] = fixed_ip
+        return ret
+
+    def floating_ip_associate(self, server_name, floating_ip, fixed_address=None):
         '''
         Associate floating IP address to server
         .. versionadded:: 2016.3.0
         '''
         nt_ks = self.compute_conn
-        server_ = self.server_by_name(server_name)
-        server = nt_ks.servers.get(server_.__dict__['id'])
-        server.add_floating_ip(floating_ip)
-        return self.floating_ip_list()[floating_ip]
+        server_id = self._server_uuid_from_name(server_name)
+        if not server_id:
+            raise SaltCloudSystemExit('Unable to find server {0}.'.format(server_name))
+        nt_ks.servers.add_floating_ip(server_id, floating_ip, fixed_address)
+        return self._floating_ip_update(floating_ip, server_id, fixed_address)
 
     def floating_ip_disassociate(self, server_name, floating_ip):
         '''
@@ -1355,10 +2979,37 @@ class SaltNova(object):
         .. versionadded:: 2016.3.0
         '''
         nt_ks = self.compute_conn
-        server_ = self.server_by_name(server_name)
-        server = nt_ks.servers.get(server_.__dict__['id'])
-        server.remove_floating_ip(floating_ip)
-        return self.floating_ip_list()[floating_ip]
+        server_id = self._server_uuid_from_name(server_name)
+        if not server_id:
+            raise SaltCloudSystemExit('Unable to find server {0}.'.format(server_name))
+        nt_ks.servers.remove_floating_ip(server_id, floating_ip)
+        return self._floating_ip_update(floating_ip, None)
+
+    def floating_ip_associate_many(self, floating_ips):
+        '''
+        Associate many floating IPs, ``floating_ips`` maps address to server
+        name. Server names are resolved with a single server listing.
+        '''
+        nt_ks = self.compute_conn
+        wanted = set(six.itervalues(floating_ips))
+        server_ids = {}
+        for item in self._server_iter(detailed=False, page_size=SERVER_PAGE_SIZE):
+            if item.name in wanted:
+                server_ids.setdefault(item.name, []).append(item.id)
+        ret = {}
+        for floating_ip, server_name in six.iteritems(floating_ips):
+            ids = server_ids.get(server_name, [])
+            if len(ids) != 1:
+                ret[floating_ip] = {'Error': '{0} servers named {1} found'.format(
+                    len(ids), server_name)}
+                continue
+            try:
+                nt_ks.servers.add_floating_ip(ids[0], floating_ip)
+            except novaclient.exceptions.ClientException as exc:
+                ret[floating_ip] = {'Error': str(exc)}
+                continue
+            ret[floating_ip] = self._floating_ip_update(floating_ip, ids[0])
+        return ret
 
 #
 # Moved from salt.modules.nova until this works in upstream
@@ -1379,6 +3030,8 @@ def _auth(profile=None):
         os_auth_system = credentials.get('keystone.os_auth_system', None)
         use_keystoneauth = credentials.get('keystone.use_keystoneauth', False)
         verify = credentials.get('keystone.verify', False)
+        token_cache = credentials.get('keystone.token_cache', False)
+        token_cache_refresh = credentials.get('keystone.token_cache_refresh', 300)
     else:
         user = __salt__['config.option']('keystone.user')
         password = __salt__['config.option']('keystone.password')
@@ -1389,6 +3042,8 @@ def _auth(profile=None):
         os_auth_system = __salt__['config.option']('keystone.os_auth_system')
         use_keystoneauth = __salt__['config.option']('keystone.use_keystoneauth', False)
         verify = __salt__['config.option']('keystone.verify', True)
+        token_cache = __salt__['config.option']('keystone.token_cache', False)
+        token_cache_refresh = __salt__['config.option']('keystone.token_cache_refresh', 300)
 
     kwargs = {
         'username': user,
@@ -1400,10 +3055,12 @@ def _auth(profile=None):
         'os_auth_plugin': os_auth_system,
         'use_keystoneauth': use_keystoneauth,
         'verify': verify,
+        'token_cache': token_cache,
+        'token_cache_refresh': token_cache_refresh,
         'profile': profile
     }
 
-    return SaltNova(**kwargs)
+    return _connect(**kwargs)
 
 
 #def boot(name, flavor_id=0, image_id=0, profile=None, timeout=300):
@@ -1610,15 +3267,16 @@ def delete(instance_id, profile=None):
     return conn.delete(instance_id)
 
 
-def flavor_list(profile=None):
+def flavor_list(profile=None, refresh=False):
     '''
     Return a list of available flavors (nova flavor-list)
+    refresh
+        Bypass the cached flavor catalog
     CLI Example:
     .. code-block:: bash
         salt '*' nova.flavor_list
     '''
-    conn = _auth(profile)
-    return conn.flavor_list()
+    return _catalog('flavor', profile, refresh=refresh)
 
 
 def flavor_create(name,      # pylint: disable=C0103
@@ -1646,13 +3304,15 @@ def flavor_create(name,      # pylint: disable=C0103
                 ram=4096 disk=10 vcpus=1
     '''
     conn = _auth(profile)
-    return conn.flavor_create(
+    ret = conn.flavor_create(
         name,
         flavor_id,
         ram,
         disk,
         vcpus
     )
+    _catalog_invalidate('flavor', profile)
+    return ret
 
 
 def flavor_delete(flavor_id, profile=None):  # pylint: disable=C0103
@@ -1663,18 +3323,21 @@ def flavor_delete(flavor_id, profile=None):  # pylint: disable=C0103
         salt '*' nova.flavor_delete 7
     '''
     conn = _auth(profile)
-    return conn.flavor_delete(flavor_id)
+    ret = conn.flavor_delete(flavor_id)
+    _catalog_invalidate('flavor', profile)
+    return ret
 
 
-def keypair_list(profile=None):
+def keypair_list(profile=None, refresh=False):
     '''
     Return a list of available keypairs (nova keypair-list)
+    refresh
+        Bypass the cached keypair catalog
     CLI Example:
     .. code-block:: bash
         salt '*' nova.keypair_list
     '''
-    conn = _auth(profile)
-    return conn.keypair_list()
+    return _catalog('keypair', profile, refresh=refresh)
 
 
 def keypair_add(name, pubfile=None, pubkey=None, profile=None):
@@ -1686,11 +3349,13 @@ def keypair_add(name, pubfile=None, pubkey=None, profile=None):
         salt '*' nova.keypair_add mykey pubkey='ssh-rsa <key> myuser@mybox'
     '''
     conn = _auth(profile)
-    return conn.keypair_add(
+    ret = conn.keypair_add(
         name,
         pubfile,
         pubkey
     )
+    _catalog_invalidate('keypair', profile)
+    return ret
 
 
 def keypair_delete(name, profile=None):
@@ -1701,20 +3366,44 @@ def keypair_delete(name, profile=None):
         salt '*' nova.keypair_delete mykey'
     '''
     conn = _auth(profile)
-    return conn.keypair_delete(name)
+    ret = conn.keypair_delete(name)
+    _catalog_invalidate('keypair', profile)
+    return ret
 
 
-def image_list(name=None, profile=None):
+def image_list(name=None, profile=None, refresh=False):
     '''
     Return a list of available images (nova images-list + nova image-show)
     If a name is provided, only that image will be displayed.
+    refresh
+        Bypass the cached image catalog
     CLI Examples:
     .. code-block:: bash
         salt '*' nova.image_list
         salt '*' nova.image_list myimage
     '''
+    if name:
+        image = _image_get(name, profile, refresh=refresh)
+        if image:
+            return {name: image}
+        return {}
+    return _catalog('image', profile, refresh=refresh)
+
+
+def _image_get(name_or_id, profile=None, refresh=False):
+    '''
+    Return one image by name or id
+
+    A fresh cached image catalog answers from its name and id index,
+    otherwise the image is looked up with a server side name filter.
+    '''
+    entry = None if refresh else _catalog_entry('image', profile)
+    if entry is not None:
+        name = entry.get('index', {}).get(str(name_or_id), name_or_id)
+        if name in entry['data']:
+            return entry['data'][name]
     conn = _auth(profile)
-    return conn.image_list(name)
+    return conn.image_list(name_or_id).get(name_or_id, {})
 
 
 def image_meta_set(image_id=None,
@@ -1730,11 +3419,13 @@ def image_meta_set(image_id=None,
         salt '*' nova.image_meta_set name=myimage salad=pasta beans=baked
     '''
     conn = _auth(profile)
-    return conn.image_meta_set(
+    ret = conn.image_meta_set(
         image_id,
         name,
         **kwargs
     )
+    _catalog_invalidate('image', profile)
+    return ret
 
 
 def image_meta_delete(image_id=None,     # pylint: disable=C0103
@@ -1751,11 +3442,13 @@ def image_meta_delete(image_id=None,     # pylint: disable=C0103
         salt '*' nova.image_meta_delete name=myimage keys=salad,beans
     '''
     conn = _auth(profile)
-    return conn.image_meta_delete(
+    ret = conn.image_meta_delete(
         image_id,
         name,
         keys
     )
+    _catalog_invalidate('image', profile)
+    return ret
 
 
 def list_(profile=None):
@@ -1791,15 +3484,49 @@ def show(server_id, profile=None):
     return server_show(server_id, profile)
 
 
-def server_list_detailed(profile=None):
+def server_list_detailed(profile=None, page_size=None):
     '''
     Return detailed list of active servers
+    page_size
+        Walk the servers API in pages of this many servers, this bounds the
+        size of each API response, the returned dictionary still holds all
+        servers
     CLI Example:
     .. code-block:: bash
         salt '*' nova.server_list_detailed
+        salt '*' nova.server_list_detailed page_size=500
     '''
     conn = _auth(profile)
-    return conn.server_list_detailed()
+    return conn.server_list_detailed(page_size=page_size)
+
+
+def server_inventory(profile=None, tenant_name=None, full=False, page_size=None):
+    '''
+    Return detailed list of servers from the local server inventory
+
+    The inventory is stored in the minion cachedir and refreshed with only
+    the servers created, updated or deleted since the previous call.
+    full
+        Rebuild the inventory from a complete server listing
+    page_size
+        Walk the servers API in pages of this many servers, this bounds the
+        size of each API response, the returned dictionary still holds all
+        servers
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.server_inventory profile=openstack
+    '''
+    conn = _authng(profile, tenant_name)
+    path = _cache_path('inventory', _cache_key(profile, tenant_name) + '.json')
+    with _cache_lock(path):
+        inventory = None if full else _cache_read(path)
+        inventory = conn.server_inventory_sync(
+            inventory, page_size=page_size or SERVER_PAGE_SIZE)
+        _cache_write(path, inventory)
+    ret = {}
+    for server in six.itervalues(inventory['servers']):
+        ret[server['name']] = server
+    return ret
 
 
 def server_show(server_id, profile=None):
@@ -1858,3 +3585,61 @@ def server_by_name(name, profile=None):
     conn = _auth(profile)
     return conn.server_by_name(name)
 
+
+def floating_ip_list(profile=None):
+    '''
+    Return list of floating IPs
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.floating_ip_list profile=openstack
+    '''
+    conn = _auth(profile)
+    return conn.floating_ip_list()
+
+
+def floating_ip_show(ip, profile=None):
+    '''
+    Return information about a floating IP
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.floating_ip_show 172.16.0.10 profile=openstack
+    '''
+    conn = _auth(profile)
+    return conn.floating_ip_show(ip)
+
+
+def floating_ip_associate(server_name, floating_ip, fixed_address=None, profile=None):
+    '''
+    Associate floating IP address to server
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.floating_ip_associate myserver 172.16.0.10 profile=openstack
+    '''
+    conn = _auth(profile)
+    return conn.floating_ip_associate(server_name, floating_ip, fixed_address)
+
+
+def floating_ip_disassociate(server_name, floating_ip, profile=None):
+    '''
+    Disassociate floating IP address from server
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.floating_ip_disassociate myserver 172.16.0.10 profile=openstack
+    '''
+    conn = _auth(profile)
+    return conn.floating_ip_disassociate(server_name, floating_ip)
+
+
+def floating_ip_associate_many(floating_ips, profile=None):
+    '''
+    Associate many floating IP addresses to servers in one call
+    floating_ips
+        Dictionary of floating IP address to server name
+    CLI Example:
+    .. code-block:: bash
+        salt '*' novang.floating_ip_associate_many \
+                floating_ips='{"172.16.0.10": "web01", "172.16.0.11": "web02"}' \
+                profile=openstack
+    '''
+    conn = _auth(profile)
+    return conn.floating_ip_associate_many(floating_ips)
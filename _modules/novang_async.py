@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''
+Concurrent compute API requests for novang
+
+Runs batches of requests prepared by novang.batch on a pooled aiohttp
+session. Python 3.7+ only, requires aiohttp. The coroutines live in
+_novang_aio.py next to this file, so this module stays importable by the
+Python 2 loader.
+'''
+from __future__ import absolute_import
+import logging
+import os
+import sys
+
+try:
+    import aiohttp  # pylint: disable=unused-import
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+log = logging.getLogger(__name__)
+
+_AIO = None
+
+__virtualname__ = 'novang_async'
+
+
+def __virtual__():
+    '''
+    Only load on Python 3.7+ with aiohttp available
+    '''
+    if sys.version_info < (3, 7):
+        return False, 'The novang_async module requires Python 3.7 or later'
+    if not HAS_AIOHTTP:
+        return False, 'The novang_async module requires aiohttp'
+    return __virtualname__
+
+
+def _aio():
+    '''
+    Import the coroutine helper on first use
+    '''
+    global _AIO
+    if _AIO is None:
+        import importlib.util  # pylint: disable=import-error,no-name-in-module
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '_novang_aio.py')
+        spec = importlib.util.spec_from_file_location('_novang_aio', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _AIO = module
+    return _AIO
+
+
+def run(requests, token, concurrency=10, timeout=300, verify=True):
+    '''
+    Run requests prepared by novang.batch concurrently
+
+    At most concurrency connections are open at a time. Returns list of
+    dictionaries with result or error in the order of requests, each with
+    the HTTP requests made as [method, url, elapsed, status, bytes] under
+    requests, for novang.stats.
+    '''
+    results = _aio().run(requests, token, int(concurrency), timeout, verify)
+    ret = []
+    for request, (result, records) in zip(requests, results):
+        if isinstance(result, Exception):
+            log.debug('{0} {1} failed: {2}'.format(
+                request['method'], request['url'], result))
+            ret.append({'error': str(result) or result.__class__.__name__,
+                        'requests': records})
+        else:
+            ret.append({'result': result, 'requests': records})
+    return ret
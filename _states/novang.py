@@ -4,6 +4,7 @@ Custom Nova state
 '''
 import logging
 import collections
+import time
 from functools import wraps
 LOG = logging.getLogger(__name__)
 
@@ -43,17 +44,20 @@ def map_instances(name='cell1'):
            'changes': {},
            'result': False,
            'comment': 'Cell "{0}" does not exists'.format(name)}
-    cell_uuid = __salt__['cmd.shell']('nova-manage cell_v2 list_cells 2>&- | grep ' + name + ' | tr -d \"\n\" | awk \'{print $4}\'')
-    if cell_uuid:
-        try:
-            __salt__['cmd.shell']('nova-manage cell_v2 map_instances --cell_uuid ' + cell_uuid)
+    if __opts__.get('test', False):
+        if name in __salt__['novang.cell_v2_list']():
+            ret['result'] = None
+            ret['comment'] = 'Instances will be mapped to cell named {0}'.format(name)
+        return ret
+    try:
+        if __salt__['novang.cell_v2_map_instances'](name):
             ret['result'] = True
             ret['comment'] = 'Instances were mapped to cell named {0}'.format(name)
             ret['changes']['Instances'] = 'Mapped to cell named {0}'.format(name)
-        except:
-            ret['result'] = False
-            ret['comment'] = 'Error while mapping instances to cell named {0}'.format(name)
-            ret['changes']['Instances'] = 'Failed to map to cell named {0}'.format(name)
+    except Exception:
+        ret['result'] = False
+        ret['comment'] = 'Error while mapping instances to cell named {0}'.format(name)
+        ret['changes']['Instances'] = 'Failed to map to cell named {0}'.format(name)
     return ret
 
 
@@ -65,20 +69,67 @@ def update_cell(name='cell1', transport_url='none:///', db_engine='mysql', db_na
            'changes': {},
            'result': False,
            'comment': 'Cell "{0}" does not exists'.format(name)}
-    cell_uuid = __salt__['cmd.shell']('nova-manage cell_v2 list_cells 2>&- | grep ' + name + ' | tr -d \"\n\" | awk \'{print $4}\'')
-    if cell_uuid:
-        try:
-            __salt__['cmd.shell']('nova-manage cell_v2 update_cell --cell_uuid ' + cell_uuid + ' --transport-url ' + transport_url + ' --database_connection ' + db_engine + '+pymysql://' + db_user + ':' + db_password + '@' + db_address + '/' + db_name + '?charset=utf8')
-            ret['result'] = True
-            ret['comment'] = 'Cell {0} updated'.format(name)
-            ret['changes'][name] = 'Cell {0} successfuly updated'.format(name)
-        except:
-            ret['result'] = False
-            ret['comment'] = 'Cell {0} not updated'.format(name)
-            ret['changes'][name] = 'Cell {0} failed to be updated'.format(name)
+    database_connection = db_engine + '+pymysql://' + db_user + ':' + db_password + '@' + db_address + '/' + db_name + '?charset=utf8'
+    test = __opts__.get('test', False)
+    try:
+        updated = __salt__['novang.cell_v2_update_cell'](
+            name, transport_url, database_connection, test=test)
+    except Exception:
+        ret['comment'] = 'Cell {0} not updated'.format(name)
+        ret['changes'][name] = 'Cell {0} failed to be updated'.format(name)
+        return ret
+    if updated is None:
+        return ret
+    ret['result'] = True
+    if not updated:
+        ret['comment'] = 'Cell {0} is up to date'.format(name)
+    elif test:
+        ret['result'] = None
+        ret['comment'] = 'Cell {0} will be updated'.format(name)
+    else:
+        ret['comment'] = 'Cell {0} updated'.format(name)
+        ret['changes'][name] = 'Cell {0} successfuly updated'.format(name)
     return ret
 
 
+def map_cell0(name='cell0', database_connection=None):
+    '''
+    Ensures that cell0 is mapped
+    '''
+    test = __opts__.get('test', False)
+    try:
+        mapped = __salt__['novang.cell_v2_map_cell0'](database_connection,
+                                                      test=test)
+    except Exception as exc:
+        return {'name': name, 'changes': {}, 'result': False,
+                'comment': 'Cell {0} not mapped: {1}'.format(name, exc)}
+    if not mapped:
+        return _already_exists(name, 'Cell')
+    if test:
+        return {'name': name, 'changes': {}, 'result': None,
+                'comment': 'Cell {0} will be mapped'.format(name)}
+    return _created(name, 'Cell', {'Cell': 'Mapped cell0'})
+
+
+def cell_present(name, transport_url=None, database_connection=None):
+    '''
+    Ensures that the nova cell exists
+    '''
+    test = __opts__.get('test', False)
+    try:
+        created = __salt__['novang.cell_v2_create_cell'](
+            name, transport_url, database_connection, test=test)
+    except Exception as exc:
+        return {'name': name, 'changes': {}, 'result': False,
+                'comment': 'Cell {0} not created: {1}'.format(name, exc)}
+    if not created:
+        return _already_exists(name, 'Cell')
+    if test:
+        return {'name': name, 'changes': {}, 'result': None,
+                'comment': 'Cell {0} will be created'.format(name)}
+    return _created(name, 'Cell', {'Cell': 'Created cell {0}'.format(name)})
+
+
 def api_db_version_present(name=None, version="20"):
     '''
     Ensures that specific api_db version is present
@@ -87,9 +138,8 @@ def api_db_version_present(name=None, version="20"):
            'changes': {},
            'result': True,
            'comment': 'Current Api_db version is not < than "{0}".'.format(version)}
-    api_db_version = __salt__['cmd.shell']('nova-manage api_db version 2>/dev/null')
     try:
-        api_db_version = int(api_db_version)
+        api_db_version = __salt__['novang.db_versions']()['api_db']
         version = int(version)
     except:
         # nova is not installed
@@ -97,7 +147,7 @@ def api_db_version_present(name=None, version="20"):
         return ret
     if api_db_version < version:
         try:
-            __salt__['cmd.shell']('nova-manage api_db sync --version ' + str(version))
+            __salt__['novang.db_sync']('api_db', version)
             ret['result'] = True
             ret['comment'] = 'Nova-manage api_db sync --version {0} was successfuly executed'.format(version)
             ret['changes']['api_db'] = 'api_db sync --version {0}'.format(version)
@@ -116,9 +166,8 @@ def db_version_present(name=None, version="334"):
            'changes': {},
            'result': True,
            'comment': 'Current db version is not < than "{0}".'.format(version)}
-    db_version = __salt__['cmd.shell']('nova-manage db version 2>/dev/null')
     try:
-        db_version = int(db_version)
+        db_version = __salt__['novang.db_versions']()['db']
         version = int(version)
     except:
         # nova is not installed
@@ -127,7 +176,7 @@ def db_version_present(name=None, version="334"):
 
     if db_version < version:
         try:
-            __salt__['cmd.shell']('nova-manage db sync --version ' + str(version))
+            __salt__['novang.db_sync']('db', version)
             ret['result'] = True
             ret['comment'] = 'Nova-manage db sync --version {0} was successfuly executed'.format(version)
             ret['changes']['db'] = 'db sync --version {0}'.format(version)
@@ -145,11 +194,10 @@ def online_data_migrations_present(name=None, api_db_version="20", db_version="3
            'changes': {},
            'result': True,
            'comment': 'Current api_db version != {0} a db version != {1}.'.format(api_db_version, db_version)}
-    cur_api_db_version = __salt__['cmd.shell']('nova-manage api_db version 2>/dev/null')
-    cur_db_version = __salt__['cmd.shell']('nova-manage db version 2>/dev/null')
     try:
-        cur_api_db_version = int(cur_api_db_version)
-        cur_db_version = int(cur_db_version)
+        versions = __salt__['novang.db_versions']()
+        cur_api_db_version = versions['api_db']
+        cur_db_version = versions['db']
         api_db_version = int(api_db_version)
         db_version = int(db_version)
     except:
@@ -158,9 +206,15 @@ def online_data_migrations_present(name=None, api_db_version="20", db_version="3
         return ret
     if cur_api_db_version == api_db_version and cur_db_version == db_version:
         try:
-            __salt__['cmd.shell']('nova-manage db online_data_migrations')
+            result = __salt__['novang.online_data_migrations']()
+            if 'error' in result:
+                raise Exception(result['error'])
             ret['result'] = True
-            ret['comment'] = 'nova-manage db online_data_migrations was successfuly executed'
+            if result['complete']:
+                ret['comment'] = 'nova-manage db online_data_migrations was successfuly executed'
+            else:
+                ret['comment'] = 'nova-manage db online_data_migrations is incomplete, ' \
+                    'rows may be left for the next run'
             ret['changes']['online_data_migrations'] = 'online_data_migrations on api_db version {0} and db version {1}'.format(api_db_version, db_version)
         except:
             ret['result'] = False
@@ -168,24 +222,320 @@ def online_data_migrations_present(name=None, api_db_version="20", db_version="3
             ret['changes']['online_data_migrations'] = 'Failed to execute online_data_migrations on api_db version {0} and db version {1}'.format(api_db_version, db_version)
     return ret
 
+def hosts_discovered(name, by_service=False, profile=None, **kwargs):
+    '''
+    Ensures that new compute hosts are mapped to cells, running
+    discover_hosts only when compute services of unknown hosts appear
+
+    by_service
+        Discover hosts from nova-compute services instead of compute nodes
+    connection_user, connection_password, connection_tenant, connection_auth_url
+        Credentials to use instead of a profile
+    '''
+    connection_args = dict([(key, value) for key, value in kwargs.items()
+                            if key.startswith('connection_')])
+    test = __opts__.get('test', False)
+    ret = {'name': name,
+           'changes': {},
+           'result': True,
+           'comment': 'No new compute hosts mapped'}
+    try:
+        new = __salt__['novang.discover_hosts'](by_service, test=test,
+                                                profile=profile, **connection_args)
+    except Exception as exc:
+        ret['result'] = False
+        ret['comment'] = 'Error while discovering hosts: {0}'.format(exc)
+        return ret
+    if new is None:
+        ret['result'] = None if test else True
+        ret['comment'] = 'Compute services could not be listed, all hosts {0} discovered'.format(
+            'will be' if test else 'were')
+    elif new and test:
+        ret['result'] = None
+        ret['comment'] = 'Hosts {0} will be discovered'.format(', '.join(new))
+    elif new:
+        ret['changes'] = {'hosts': new}
+        ret['comment'] = 'Hosts {0} were discovered'.format(', '.join(new))
+    return ret
+
+
+def stats_reported(name, tag='novang/stats', reset=True):
+    '''
+    Reports the API requests made by novang in this run and sends them as
+    a Salt event, meant to run last with order: last
+    '''
+    stats = __salt__['novang.stats'](reset=reset, fire_event=True, tag=tag)
+    return {'name': name,
+            'changes': {},
+            'result': True,
+            'comment': '{0} API requests ({1} failed) in {2}s, {3} bytes received'.format(
+                stats['calls'], stats['errors'], stats['time'], stats['bytes'])}
+
+
+def online_data_migrations_completed(name, max_count=1000, budget=600):
+    '''
+    Ensures that nova online data migrations are run in batches of
+    max_count rows, starting no new batch after budget seconds
+    '''
+    ret = {'name': name,
+           'changes': {},
+           'result': True,
+           'comment': ''}
+    if __opts__.get('test', False):
+        ret['result'] = None
+        ret['comment'] = 'Online data migrations will be run'
+        return ret
+    result = __salt__['novang.online_data_migrations'](max_count, budget)
+    if result['migrated']:
+        ret['changes'] = {'migrated': result['migrated'],
+                          'migrations': dict([(migration, rows) for migration, rows
+                                              in result['migrations'].items() if rows])}
+    ret['comment'] = 'Migrated {0} rows in {1} batches in {2}s ({3} rows/s)'.format(
+        result['migrated'], result['batches'], result['elapsed'], result['rate'])
+    if 'error' in result:
+        ret['result'] = False
+        ret['comment'] += ', failed: {0}'.format(result['error'])
+    elif not result['complete']:
+        ret['comment'] += ', budget of {0}s used up with rows possibly ' \
+            'left, continuing on the next run'.format(budget)
+    return ret
+
+
 def quota_present(tenant_name, profile, name=None, **kwargs):
     '''
     Ensures that the nova quota exists
     '''
     changes = {}
+    quotas = __salt__['novang.quota_list'](tenant_name, profile)
     for key, value in kwargs.items():
-        quota = __salt__['novang.quota_get'](key, tenant_name, profile)
-        if quota != value:
-            arg = {}
-            arg[key] = value
+        if key.startswith('__'):
+            continue
+        if quotas.get(key) != value:
             changes[key] = value
-            __salt__['novang.quota_update'](tenant_name, profile, **arg)
     if bool(changes):
+        __salt__['novang.quota_update'](tenant_name, profile, **changes)
         return _updated(tenant_name, 'tenant', changes)
     else:
         return _no_change(tenant_name, 'tenant')
 
 
+def quotas_present(name, quotas, profile, concurrency=10):
+    '''
+    Ensures that the nova quotas of many tenants are set
+
+    quotas
+        Dictionary of tenant name to dictionary of quota values
+    profile
+        Keystone profile with the credentials
+    concurrency
+        Maximum number of tenants reconciled in parallel
+    '''
+    start = time.time()
+    result = __salt__['novang.quotas_apply'](quotas, profile, concurrency,
+                                             test=__opts__.get('test', False))
+    elapsed = time.time() - start
+    ret = {'name': name,
+           'changes': result['changes'],
+           'result': True,
+           'comment': 'Quotas of {0} tenants checked in {1:.2f}s, {2} updated'.format(
+               len(quotas), elapsed, len(result['changes']))}
+    if result['changes'] and __opts__.get('test', False):
+        ret['result'] = None
+        ret['comment'] = 'Quotas of {0} tenants will be updated'.format(len(result['changes']))
+    if result['errors']:
+        ret['result'] = False
+        ret['comment'] += '; failed: ' + ', '.join(
+            ['{0} ({1})'.format(tenant, error)
+             for tenant, error in sorted(result['errors'].items())])
+    return ret
+
+
+def instances_booted(name, instances, profile=None, tenant_name=None,
+                     concurrency=10, timeout=300):
+    '''
+    Ensures that many nova instances exist, booting the missing ones in
+    parallel
+
+    instances
+        List of instance specs as accepted by novang.boot_many, instances
+        with count set are expected as <name>-<n>
+    concurrency
+        Maximum number of create requests in flight
+    '''
+    existing = __salt__['novang.server_list'](profile, tenant_name)
+    missing = []
+    for spec in instances:
+        count = int(spec.get('count') or 1)
+        if count > 1:
+            names = ['{0}-{1}'.format(spec['name'], index)
+                     for index in range(1, count + 1)]
+        else:
+            names = [spec['name']]
+        absent = [instance for instance in names if instance not in existing]
+        if len(absent) == len(names):
+            missing.append(spec)
+            continue
+        for instance in absent:
+            spec = dict(spec, name=instance)
+            spec.pop('count', None)
+            missing.append(spec)
+    ret = {'name': name,
+           'changes': {},
+           'result': True,
+           'comment': 'All {0} instance specs already exist'.format(len(instances))}
+    if not missing:
+        return ret
+    if __opts__.get('test', False):
+        ret['result'] = None
+        ret['comment'] = 'Instances {0} will be created'.format(
+            ', '.join(sorted([spec['name'] for spec in missing])))
+        return ret
+    start = time.time()
+    result = __salt__['novang.boot_many'](missing, profile, tenant_name,
+                                          concurrency, timeout)
+    ret['changes'] = dict([(instance, server['id'])
+                           for instance, server in result['servers'].items()])
+    ret['comment'] = '{0} instances booted in {1:.2f}s'.format(
+        len(result['servers']), time.time() - start)
+    if result['errors']:
+        ret['result'] = False
+        ret['comment'] += '; failed: ' + ', '.join(
+            ['{0} ({1})'.format(instance, error)
+             for instance, error in sorted(result['errors'].items())])
+    return ret
+
+
+def instances_present(name, instances, profile=None, tenant_name=None,
+                      concurrency=10, timeout=300):
+    '''
+    Ensures that a whole set of nova instances exists
+
+    Servers, flavors, images, security groups and networks are each listed
+    once, all instances are resolved against those indexes and only the
+    missing ones are booted, in parallel.
+
+    instances
+        Dictionary of instance name to spec, or list of specs with name, as
+        accepted by instance_present: flavor, image, networks and
+        security_groups
+    concurrency
+        Maximum number of create requests in flight
+    '''
+    if isinstance(instances, dict):
+        instances = [dict(spec, name=instance)
+                     for instance, spec in sorted(instances.items())]
+    ret = {'name': name,
+           'changes': {},
+           'result': True,
+           'comment': 'All {0} instances already exist'.format(len(instances))}
+    existing = __salt__['novang.server_list'](profile, tenant_name)
+    missing = [spec for spec in instances if spec['name'] not in existing]
+    if not missing:
+        return ret
+
+    flavors = {}
+    for flavor, item in __salt__['novang.flavor_list'](profile).items():
+        flavors[flavor] = flavors[str(item['id'])] = item['id']
+    images = {}
+    for image, item in __salt__['novang.image_list'](profile=profile).items():
+        images[image] = images[str(item['id'])] = item['id']
+    secgroups = __salt__['novang.secgroup_list'](profile, tenant_name)
+    networks = __salt__['novang.network_list'](profile)
+
+    specs = []
+    errors = {}
+    for spec in missing:
+        instance = spec['name']
+        image = str(spec['image'])
+        if image not in images:
+            # catalog may predate a freshly uploaded image
+            found = __salt__['novang.image_list'](image, profile)
+            images[image] = found[image]['id'] if found else None
+        if str(spec['flavor']) not in flavors:
+            errors[instance] = 'Flavor "{0}" doesn\'t exists'.format(spec['flavor'])
+            continue
+        if images[image] is None:
+            errors[instance] = 'Image "{0}" doesn\'t exists'.format(image)
+            continue
+        boot_spec = {'name': instance,
+                     'flavor_id': flavors[str(spec['flavor'])],
+                     'image_id': images[image]}
+        absent = [secgroup for secgroup in spec.get('security_groups') or []
+                  if secgroup not in secgroups]
+        if absent:
+            errors[instance] = 'Security group "{0}" doesn\'t exists'.format(absent[0])
+            continue
+        if spec.get('security_groups') is not None:
+            boot_spec['security_groups'] = list(spec['security_groups'])
+        nics = []
+        for net in spec.get('networks') or []:
+            if net.get('name') not in networks:
+                errors[instance] = 'Network "{0}" doesn\'t exists'.format(net.get('name'))
+                break
+            nic = {'net-id': networks[net['name']]['id']}
+            if net.get('v4_fixed_ip') is not None:
+                nic['v4-fixed-ip'] = net['v4_fixed_ip']
+            nics.append(nic)
+        if instance in errors:
+            continue
+        boot_spec['nics'] = nics
+        specs.append(boot_spec)
+
+    if __opts__.get('test', False):
+        ret['result'] = None
+        ret['comment'] = 'Instances {0} will be created'.format(
+            ', '.join([spec['name'] for spec in specs]) or 'none')
+    elif specs:
+        start = time.time()
+        result = __salt__['novang.boot_many'](specs, profile, tenant_name,
+                                              concurrency, timeout)
+        ret['changes'] = dict([(instance, server['id'])
+                               for instance, server in result['servers'].items()])
+        ret['comment'] = '{0} of {1} instances booted in {2:.2f}s'.format(
+            len(result['servers']), len(specs), time.time() - start)
+        errors.update(result['errors'])
+    if errors:
+        ret['result'] = False
+        if not specs:
+            ret['comment'] = 'No instances booted'
+        ret['comment'] += '; failed: ' + ', '.join(
+            ['{0} ({1})'.format(instance, error)
+             for instance, error in sorted(errors.items())])
+    return ret
+
+
+def aggregate_host_present(name, aggregate, profile=None, **kwargs):
+    '''
+    Ensures that the compute host is a member of the nova aggregate
+
+    name
+        Name of the compute host
+    aggregate
+        Name of the aggregate, or of the availability zone aggregate
+    connection_user, connection_password, connection_tenant, connection_auth_url
+        Credentials to use instead of a profile
+    '''
+    connection_args = dict([(key, value) for key, value in kwargs.items()
+                            if key.startswith('connection_')])
+    test = __opts__.get('test', False)
+    added = __salt__['novang.aggregate_add_host'](aggregate, name, profile,
+                                                  test=test, **connection_args)
+    ret = {'name': name,
+           'changes': {},
+           'result': True,
+           'comment': 'Host {0} is already in aggregate {1}'.format(name, aggregate)}
+    if added is None:
+        ret['result'] = False
+        ret['comment'] = 'Aggregate {0} doesn\'t exist'.format(aggregate)
+    elif added and test:
+        ret['result'] = None
+        ret['comment'] = 'Host {0} will be added to aggregate {1}'.format(name, aggregate)
+    elif added:
+        ret['changes'] = {'aggregate': aggregate}
+        ret['comment'] = 'Host {0} was added to aggregate {1}'.format(name, aggregate)
+    return ret
+
+
 def availability_zone_present(name=None, availability_zone=None, profile=None):
     '''
     Ensures that the nova availability zone exists
@@ -267,7 +617,18 @@ def instance_present(name, flavor, image, networks, security_groups=None, profil
             else:
                 nics.append({'net-id': network_id})
     kwargs['nics'] = nics
-    new_instance_id = __salt__['novang.boot'] (name, flavor_id, image_id, profile, tenant_name, **kwargs)
+    try:
+        new_instance = __salt__['novang.boot'](name, flavor_id, image_id, profile, tenant_name, **kwargs)
+    except Exception as exc:
+        return {'name': name,
+                'changes': {},
+                'result': False,
+                'comment': 'Instance "{0}" failed to boot: {1}'.format(name, exc)}
+    if not new_instance:
+        return {'name': name,
+                'changes': {},
+                'result': False,
+                'comment': 'Timed out waiting for instance "{0}" to become active'.format(name)}
     return {'name': name,
             'changes': {},
             'result': True,